@@ -0,0 +1,171 @@
+import threading
+from datetime import date, timedelta
+
+import credits
+from board_cache import bump_board_version, get_zone
+from booking import BookingOutcome
+from ledger import record_advance, record_advance_cancel
+
+# --- จองล่วงหน้าหลายวัน (ปฏิทินต่อล็อคเป็น bitmap) ---
+# stall_calendar.bits ของแต่ละล็อค: bit i = วัน (calendar_start + i) ถูกจองแล้ว
+# หน้าต่าง 62 วัน พอดี INTEGER 64-bit ของ SQLite (ไม่แตะ sign bit) ล็อคที่ไม่เคยถูกจองล่วงหน้าไม่มีแถว (= 0)
+# รายละเอียดร้านต่อวันอยู่ใน advance_bookings ส่วน bitmap ใช้ตอบ "ว่างครบทุกวันไหม" ด้วย bits & mask
+# reset รายวันแค่เลื่อนหน้าต่าง (bits >> จำนวนวัน) แล้วย้ายการจองของวันนี้ลงแถว stalls
+# bitmap จึงมีแต่วันพรุ่งนี้เป็นต้นไป วันนี้ว่างหรือไม่ดูจาก stalls.status เหมือนเดิม
+
+WINDOW_DAYS = 62
+
+_calendar = (None, {})          # ((calendar_version, calendar_start), {stall_id: bits}) ต่อ worker
+_lock = threading.Lock()
+
+
+def bump_calendar_version(conn):
+    conn.execute("""
+        INSERT INTO app_state (key, value) VALUES ('calendar_version', 1)
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+    """)
+
+
+def get_calendar_state(conn):
+    # (version, วันแรกของหน้าต่าง) DB เก่าที่ยังไม่เคยเลื่อนหน้าต่างใช้วันที่ reset ล่าสุด
+    state = dict(conn.execute("""
+        SELECT key, value FROM app_state WHERE key IN ('calendar_version', 'calendar_start', 'last_reset_day')
+    """).fetchall())
+    return int(state.get('calendar_version') or 0), state.get('calendar_start') or state.get('last_reset_day')
+
+
+def day_mask(start, days):
+    # วันที่ (YYYY-MM-DD) -> mask ของหน้าต่างที่เริ่ม start วันนอกหน้าต่าง = ValueError
+    first = date.fromisoformat(start)
+    mask = 0
+    for day in days:
+        offset = (date.fromisoformat(day) - first).days
+        if not 0 <= offset < WINDOW_DAYS:
+            raise ValueError(day)
+        mask |= 1 << offset
+    return mask
+
+
+def day_range(first, last):
+    # เช็คความยาวก่อนสร้าง list (ช่วงยาวกว่าหน้าต่างจองไม่ได้อยู่แล้ว ไม่ต้องไล่สร้างทีละวัน)
+    first, last = date.fromisoformat(first), date.fromisoformat(last)
+    if not 0 <= (last - first).days < WINDOW_DAYS:
+        raise ValueError(last)
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def get_calendar(conn):
+    # {stall_id: bits} ทุกล็อคที่มีการจองล่วงหน้า โหลดใหม่เมื่อ version หรือหน้าต่างเปลี่ยน
+    global _calendar
+    state = get_calendar_state(conn)
+    if _calendar[0] == state:
+        return state[1], _calendar[1]
+    with _lock:
+        if _calendar[0] != state:
+            _calendar = (state, dict(conn.execute("SELECT stall_id, bits FROM stall_calendar WHERE bits != 0")))
+        return state[1], _calendar[1]
+
+
+def free_stalls(conn, zone, days):
+    # ล็อคในโซนที่ว่างครบทุกวันใน days ถ้ารวมวันนี้ต้องว่างในแถว stalls ด้วย
+    start, calendar = get_calendar(conn)
+    mask = day_mask(start, days)
+    stalls = get_zone(conn, zone)
+    if start in days:
+        stalls = [s for s in stalls if s['status'] == 'available']
+    return [s for s in stalls if not calendar.get(s['id'], 0) & mask]
+
+
+def reserve(conn, stall_id, user_id, shop_name, phone, category, days, payment_ref='', pay_with_credit=False):
+    # จองทุกวันใน days ให้ได้ครบ หรือไม่ได้เลย (conditional UPSERT บน bitmap กันจองซ้อน)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _, start = get_calendar_state(conn)
+        mask = day_mask(start, days)
+        stall = conn.execute("SELECT price FROM stalls WHERE id=?", (stall_id,)).fetchone()
+        if not stall:
+            conn.rollback()
+            return BookingOutcome.NOT_FOUND
+        claimed = conn.execute("""
+            INSERT INTO stall_calendar (stall_id, bits) VALUES (?, ?)
+            ON CONFLICT(stall_id) DO UPDATE SET bits = bits | excluded.bits WHERE bits & excluded.bits = 0
+        """, (stall_id, mask)).rowcount
+        if not claimed:
+            conn.rollback()
+            return BookingOutcome.TAKEN
+        total = stall['price'] * len(days)
+        if pay_with_credit:
+            if credits.balance(conn, user_id) < total:
+                conn.rollback()
+                return BookingOutcome.INSUFFICIENT_CREDIT
+            credits.post(conn, user_id, -total, 'advance_booking', ref=f'stall:{stall_id}:{days[0]}..{days[-1]}')
+        conn.executemany("""
+            INSERT INTO advance_bookings (stall_id, day, user_id, shop_name, phone, product_category, payment_ref, amount)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(stall_id, day, user_id, shop_name, phone, category, 'CREDIT' if pay_with_credit else payment_ref,
+               stall['price']) for day in days])
+        record_advance(conn, stall_id, user_id, days)
+        bump_calendar_version(conn)
+        conn.commit()
+        return BookingOutcome.BOOKED
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def cancel(conn, booking_id, user_id, today, is_admin=False):
+    # ยกเลิกวันเดียวที่ยังไม่ถึง คืนเงินที่จ่ายไว้ หรือ None ถ้ายกเลิกไม่ได้
+    # (วันนี้ถูกย้ายลงแถว stalls แล้ว ยกเลิกผ่าน /cancel_booking ตามเวลาปกติ)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT * FROM advance_bookings WHERE id=? AND day > ?", (booking_id, today)).fetchone()
+        if not row or (row['user_id'] != user_id and not is_admin):
+            conn.rollback()
+            return None
+        record_advance_cancel(conn, row['stall_id'], row['user_id'], row['amount'], row['day'])
+        credits.post(conn, row['user_id'], row['amount'], 'refund', ref=f"stall:{row['stall_id']}:{row['day']}")
+        _, start = get_calendar_state(conn)
+        conn.execute("UPDATE stall_calendar SET bits = bits & ~? WHERE stall_id=?",
+                     (day_mask(start, [row['day']]), row['stall_id']))
+        conn.execute("DELETE FROM advance_bookings WHERE id=?", (booking_id,))
+        bump_calendar_version(conn)
+        conn.commit()
+        return row['amount']
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def get_user_bookings(conn, user_id, today):
+    return conn.execute("""
+        SELECT a.*, s.name AS stall_name, s.zone FROM advance_bookings a JOIN stalls s ON s.id = a.stall_id
+        WHERE a.user_id=? AND a.day >= ? ORDER BY a.day, s.id
+    """, (user_id, today)).fetchall()
+
+
+def advance_window(conn, today_str):
+    # เรียกจาก reset รายวัน (อยู่ใน transaction เดียวกัน) คืนจำนวนล็อคที่ย้ายการจองของวันนี้ลง stalls
+    _, start = get_calendar_state(conn)
+    shift = (date.fromisoformat(today_str) - date.fromisoformat(start)).days if start else 0
+    if shift < 0:
+        # ถอยหน้าต่างไม่ได้ (bit ของวันที่ผ่านไปแล้วถูกทิ้งไปแล้ว) ถ้าเลื่อน calendar_start กลับ bitmap จะเพี้ยนทั้งตาราง
+        raise ValueError(f'calendar window cannot move back from {start} to {today_str}')
+    if shift >= WINDOW_DAYS:
+        conn.execute("DELETE FROM stall_calendar")
+    elif shift > 0:
+        # bit 0 (วันนี้) ล้างทิ้ง ตั้งแต่นี้ไปสถานะของวันนี้อยู่ที่แถว stalls (ยกเลิก/จองหน้างานได้ตามปกติ)
+        conn.execute("UPDATE stall_calendar SET bits = (bits >> ?) & ~1 WHERE bits != 0", (shift,))
+        conn.execute("DELETE FROM stall_calendar WHERE bits = 0")
+    conn.execute("INSERT OR REPLACE INTO app_state (key, value) VALUES ('calendar_start', ?)", (today_str,))
+    bump_calendar_version(conn)
+    # การจองของวันนี้ลงแถว stalls เหมือนจองหน้างาน (ledger บันทึกไปแล้วตอนจองล่วงหน้า)
+    promoted = conn.execute("""
+        UPDATE stalls
+        SET status='booked', shop_name=a.shop_name, phone=a.phone, product_category=a.product_category,
+            booked_by=a.user_id, booking_date=a.day, payment_ref=a.payment_ref, payment_status='paid'
+        FROM advance_bookings a
+        WHERE a.stall_id = stalls.id AND a.day = ? AND stalls.status = 'available'
+    """, (today_str,)).rowcount
+    if promoted:
+        bump_board_version(conn)
+    return promoted
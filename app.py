@@ -1,27 +1,58 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, session, flash, jsonify
+import json
 import sqlite3
-from datetime import datetime, time, timedelta
+import uuid
+from datetime import time, timedelta
 import os
+from time import monotonic
 
-# --- สร้าง Database อัตโนมัติ ---
-if not os.path.exists('market.db'):
-    from setup_db import create_db
-    create_db()
-    print(">>> Database Created!")
+import advance
+import board_cache
+import booking
+import booking_queue
+import counters
+import credits
+import db
+import exports
+import fragments
+import ledger
+import live
+import metrics
+import passwords
+import ratelimit
+import reviews
+import rollover
+import user_cache
+import search as search_index
+from booking import BookingOutcome
+from booking_queue import BookingBusy
+from db import get_db, get_report_db
+from passwords import PasswordBusy
+from rollover import get_now_thai
 
 app = Flask(__name__)
 app.secret_key = 'market_project_key'
+# ตั้งค่าผ่าน env ได้ เช่น MARKET_DATABASE=market.db, MARKET_DB_POOL_SIZE=16, MARKET_SLOW_QUERY_MS=50
+app.config.from_prefixed_env('MARKET')
+db.init_app(app)
+metrics.init_app(app)
+fragments.init_app(app)
+live.init_app(app)
+booking_queue.init_app(app)
+passwords.init_app(app)
+ratelimit.init_app(app)
+user_cache.init_app(app)
 
-def get_db():
-    conn = sqlite3.connect('market.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+# --- สร้าง Database อัตโนมัติ ---
+if not os.path.exists(app.config['DATABASE']):
+    from setup_db import create_db
+    create_db(app.config['DATABASE'])
+    print(">>> Database Created!")
+else:
+    from setup_db import upgrade_db
+    upgrade_db(app.config['DATABASE'])
 
 # --- Helper Functions ---
-def get_now_thai():
-    # แปลงเวลา Server (UTC) เป็นเวลาไทย (UTC+7)
-    return datetime.utcnow() + timedelta(hours=7)
-
 def get_market_info():
     now_thai = get_now_thai()
     current_time = now_thai.time()
@@ -40,21 +71,6 @@ def get_market_info():
         'can_cancel': current_time < cancel_deadline
     }
 
-def check_and_reset_daily():
-    conn = get_db()
-    now_thai = get_now_thai()
-    today_str = now_thai.strftime('%Y-%m-%d')
-    
-    # Reset ล็อคของวันเก่า (ไม่คืนเงินเครดิต)
-    conn.execute("""
-        UPDATE stalls 
-        SET status='available', shop_name='', phone='', product_category='', 
-            booked_by=NULL, booking_date='', payment_ref='', payment_status='pending'
-        WHERE status='booked' AND booking_date != ?
-    """, (today_str,))
-    conn.commit()
-    conn.close()
-
 # --- Routes ---
 
 @app.route('/')
@@ -62,35 +78,122 @@ def index():
     if 'user_id' not in session:
         return redirect(url_for('login'))
 
-    check_and_reset_daily()
+    rollover.ensure_today(db.get_pool())
     info = get_market_info()
-    search = request.args.get('q', '')
+    search = request.args.get('q', '').strip()
     active_zone = request.args.get('zone', 'Food Court')
     
     conn = get_db()
-    current_user = conn.execute("SELECT * FROM users WHERE id=?", (session['user_id'],)).fetchone()
+    # จาก cache ต่อ worker (เช็คแค่ version ของ user นี้)
+    current_user = user_cache.get_user(conn, session['user_id'])
     # อัปเดตเครดิตใน session ให้ตรงกับ DB เสมอ
     if current_user:
         session['credit'] = current_user['credit']
     
+    board_version = board_cache.get_board_version(conn)
+    # จำนวนรีวิวใช้เป็น version ของคะแนนร้าน (การ์ดในผังล็อค / อันดับร้าน / รีวิวล่าสุด)
+    review_version, avg_rating = reviews.get_summary(conn)
+    found_reviews = []
     if search:
-        stalls = conn.execute("SELECT * FROM stalls WHERE shop_name LIKE ?", ('%' + search + '%',)).fetchall()
+        stalls, found_reviews = search_index.search(conn, search)
         if stalls: active_zone = stalls[0]['zone']
+        stalls = [s for s in stalls if s['zone'] == active_zone]
+        stall_grid = render_stall_grid(conn, stalls, active_zone, None)
     else:
-        stalls = conn.execute("SELECT * FROM stalls").fetchall()
-    
-    zones = {}
-    for stall in stalls:
-        z = stall['zone']
-        if z not in zones: zones[z] = []
-        zones[z].append(stall)
-        
-    reviews = conn.execute("SELECT * FROM reviews ORDER BY id DESC").fetchall()
-    avg_rating = conn.execute("SELECT AVG(rating) FROM reviews").fetchone()[0] or 0.0
-    conn.close()
-    
-    return render_template('index.html', zones=zones, reviews=reviews, avg_rating=round(avg_rating, 1),
-                           search=search, active_zone=active_zone, info=info, user_info=current_user)
+        # โหลดเฉพาะโซนที่ดูอยู่ จาก cache (โหลดใหม่เมื่อมีการจอง/ยกเลิก/reset/รีวิวใหม่ เท่านั้น)
+        stalls = board_cache.get_zone(conn, active_zone, board_version)
+        stall_grid = render_stall_grid(conn, stalls, active_zone, (board_version, review_version))
+
+    # รีวิวล่าสุด + ร้านคะแนนสูงสุด เหมือนกันทุกคน render ใหม่เฉพาะตอนมีรีวิวเพิ่ม
+    recent_reviews = fragments.render_cached(
+        'recent_reviews', None, review_version,
+        lambda: render_template('_recent_reviews.html', reviews=reviews.get_page(conn),
+                                review_page_size=reviews.PAGE_SIZE))
+    top_shops = fragments.render_cached(
+        'top_shops', None, review_version,
+        lambda: render_template('_top_shops.html', shops=reviews.get_top_shops(conn)))
+
+    return render_template('index.html', stalls=stalls, stall_grid=stall_grid, recent_reviews=recent_reviews,
+                           top_shops=top_shops, review_page_size=reviews.PAGE_SIZE, avg_rating=avg_rating,
+                           found_reviews=found_reviews,
+                           board_version=board_version, search=search, active_zone=active_zone, info=info,
+                           user_info=current_user)
+
+def render_stall_grid(conn, stalls, zone, version):
+    # HTML ผังล็อคของโซนเหมือนกันทุกคน cache ตาม (โซน, board version, review version) โซนที่ไม่มีล็อคไม่ต้อง cache
+    return fragments.render_cached(
+        'stall_grid', zone, version if stalls else None,
+        lambda: render_template('_stall_grid.html', stalls=stalls,
+                                ratings=reviews.get_shop_ratings(conn, [s['shop_name'] for s in stalls])))
+
+# --- ผังล็อคของโซนเดียว (โหลดตอนสลับแท็บโซน) ---
+@app.route('/stalls')
+def zone_stalls():
+    if 'user_id' not in session: return redirect('/login')
+
+    rollover.ensure_today(db.get_pool())
+    zone = request.args.get('zone', 'Food Court')
+    conn = get_db()
+    version = board_cache.get_board_version(conn)
+    review_version, _ = reviews.get_summary(conn)
+    return render_stall_grid(conn, board_cache.get_zone(conn, zone, version), zone, (version, review_version))
+
+# --- JSON API ผังล็อค (รองรับ ETag / If-None-Match) ---
+BOARD_FIELDS = ('id', 'name', 'zone', 'price', 'status', 'shop_name', 'product_category', 'booked_by')
+
+@app.route('/api/board')
+def api_board():
+    if 'user_id' not in session:
+        return jsonify({'error': 'login required'}), 401
+
+    rollover.ensure_today(db.get_pool())
+    conn = get_db()
+    zone = request.args.get('zone')
+    # ETag มาจากเลข version อย่างเดียว ถ้าไม่เปลี่ยนตอบ 304 โดยไม่แตะตาราง stalls
+    version = board_cache.get_board_version(conn)
+    etag = f'board-{version}'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        if zone:
+            zones = {zone: board_cache.get_zone(conn, zone, version)}
+        else:
+            zones = board_cache.get_board(conn, version)
+        response = jsonify({
+            'version': version,
+            'zones': {z: [{f: s[f] for f in BOARD_FIELDS} for s in stalls] for z, stalls in zones.items()},
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# --- SSE: ส่งการเปลี่ยนสถานะล็อคแบบ realtime ---
+STREAM_FIELDS = ('stall_id', 'name', 'zone', 'price', 'status', 'shop_name', 'booked_by')
+
+@app.route('/stream')
+def stall_stream():
+    if not app.config['LIVE_STREAM']: abort(404)
+    if 'user_id' not in session:
+        return jsonify({'error': 'login required'}), 401
+
+    feed = live.get_feed()
+    cursor = request.headers.get('Last-Event-ID', type=int)
+    deadline = monotonic() + app.config['LIVE_STREAM_MAX_AGE']
+
+    def generate():
+        yield 'retry: 3000\n\n'
+        for change in feed.subscribe(cursor):
+            if monotonic() > deadline:
+                # ปล่อย worker คืน browser ต่อใหม่เอง (ส่ง Last-Event-ID ของ event ล่าสุดมาด้วย)
+                return
+            if change is None:
+                yield ': ping\n\n'
+                continue
+            data = json.dumps({f: change[f] for f in STREAM_FIELDS}, ensure_ascii=False)
+            yield f"id: {change['id']}\nevent: stall\ndata: {data}\n\n"
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # --- ระบบเติมเงิน ---
 @app.route('/topup', methods=['GET', 'POST'])
@@ -98,15 +201,24 @@ def topup():
     if 'user_id' not in session: return redirect('/login')
     
     if request.method == 'POST':
-        amount = int(request.form['amount'])
+        # จำนวนต้องเป็นเลขบวก ค่าผิดแค่แจ้งเตือน ไม่ 500 และไม่ลงรายการติดลบในสมุดเครดิต
+        amount = request.form.get('amount', type=int)
+        if amount is None or amount <= 0:
+            flash('จำนวนเงินไม่ถูกต้อง', 'danger')
+            return redirect(url_for('topup'))
+        # request_key มากับฟอร์ม กดส่งซ้ำกี่ครั้งก็เติมครั้งเดียว
+        key = f"topup:{session['user_id']}:{request.form.get('request_key') or uuid.uuid4().hex}"
         conn = get_db()
-        conn.execute("UPDATE users SET credit = credit + ? WHERE id=?", (amount, session['user_id']))
+        applied = credits.post(conn, session['user_id'], amount, 'topup', idempotency_key=key)
         conn.commit()
-        conn.close()
-        flash(f'เติมเงินสำเร็จ {amount} บาท!', 'success')
+        if applied:
+            flash(f'เติมเงินสำเร็จ {amount} บาท!', 'success')
+        else:
+            flash('รายการเติมเงินนี้ทำไปแล้ว', 'warning')
         return redirect(url_for('index'))
         
-    return render_template('topup.html')
+    return render_template('topup.html', request_key=uuid.uuid4().hex,
+                           user_info=user_cache.get_user(get_db(), session['user_id']))
 
 # --- ระบบจอง ---
 @app.route('/book', methods=['POST'])
@@ -120,44 +232,104 @@ def book_stall():
     current_zone = request.form['current_zone']
     payment_method = request.form.get('payment_method', 'transfer')
     
-    conn = get_db()
-    user = conn.execute("SELECT * FROM users WHERE id=?", (session['user_id'],)).fetchone()
-    stall = conn.execute("SELECT * FROM stalls WHERE id=?", (stall_id,)).fetchone()
-
-    if stall['status'] == 'booked':
-        flash('ไม่ทัน! ล็อคนี้ถูกจองไปแล้ว', 'danger')
-        conn.close()
-        return redirect(url_for('index', zone=current_zone))
-
     payment_ref = ''
     if payment_method == 'transfer':
         payment_ref = request.form['payment_ref']
         if not payment_ref:
             flash('กรุณากรอกข้อมูลการโอนเงิน', 'warning')
-            conn.close()
-            return redirect(url_for('index', zone=current_zone))
-    elif payment_method == 'credit':
-        if user['credit'] >= stall['price']:
-            new_credit = user['credit'] - stall['price']
-            conn.execute("UPDATE users SET credit=? WHERE id=?", (new_credit, session['user_id']))
-            payment_ref = 'CREDIT'
-        else:
-            flash('เครดิตไม่พอ กรุณาเติมเงิน', 'danger')
-            conn.close()
             return redirect(url_for('index', zone=current_zone))
 
     today_str = get_now_thai().strftime('%Y-%m-%d')
-    conn.execute("""
-        UPDATE stalls 
-        SET status='booked', shop_name=?, phone=?, product_category=?, booked_by=?, booking_date=?, payment_ref=?, payment_status='paid'
-        WHERE id=?
-    """, (shop_name, phone, category, session['user_id'], today_str, payment_ref, stall_id))
-    conn.commit()
-    conn.close()
-    
-    flash('จองล็อคสำเร็จ!', 'success')
+    queue = booking_queue.get_queue()
+    try:
+        if queue:
+            # ส่งเข้าคิวของ worker แล้วรอผลของตัวเอง (รวม commit เป็นก้อน)
+            outcome = queue.book(stall_id, session['user_id'], shop_name, phone, category, today_str,
+                                 payment_ref=payment_ref, pay_with_credit=(payment_method == 'credit'))
+        else:
+            outcome = booking.book(get_db(), stall_id, session['user_id'], shop_name, phone, category, today_str,
+                                   payment_ref=payment_ref, pay_with_credit=(payment_method == 'credit'))
+    except BookingBusy:
+        flash('ระบบกำลังยุ่ง กรุณาลองใหม่อีกครั้ง', 'warning')
+        return redirect(url_for('index', zone=current_zone))
+
+    if outcome is BookingOutcome.BOOKED:
+        flash('จองล็อคสำเร็จ!', 'success')
+    elif outcome is BookingOutcome.INSUFFICIENT_CREDIT:
+        flash('เครดิตไม่พอ กรุณาเติมเงิน', 'danger')
+    else:
+        flash('ไม่ทัน! ล็อคนี้ถูกจองไปแล้ว', 'danger')
     return redirect(url_for('index', zone=current_zone))
 
+# --- จองล่วงหน้าหลายวัน (ปฏิทิน bitmap ใน advance.py) ---
+def advance_days(start, end):
+    # ช่วงวันที่จากฟอร์ม ต้องเริ่มพรุ่งนี้เป็นอย่างน้อย (วันนี้จองผ่านผังล็อคปกติ) ผิดรูปแบบ = ValueError
+    if start <= get_now_thai().strftime('%Y-%m-%d'):
+        raise ValueError(start)
+    return advance.day_range(start, end)
+
+@app.route('/advance')
+def advance_calendar():
+    if 'user_id' not in session: return redirect('/login')
+
+    rollover.ensure_today(db.get_pool())
+    today = get_now_thai().date()
+    zone = request.args.get('zone', 'Food Court')
+    start = request.args.get('start') or (today + timedelta(days=1)).isoformat()
+    end = request.args.get('end') or (today + timedelta(days=7)).isoformat()
+    conn = get_db()
+    try:
+        days = advance_days(start, end)
+        # ว่างครบทุกวันในช่วง = bits & mask เป็น 0 (ไม่ต้องไล่แถวการจองทีละวัน)
+        stalls = advance.free_stalls(conn, zone, days)
+    except ValueError:
+        flash(f'ช่วงวันที่ไม่ถูกต้อง (จองล่วงหน้าได้ตั้งแต่พรุ่งนี้ ไม่เกิน {advance.WINDOW_DAYS - 1} วัน)', 'warning')
+        days, stalls = [], []
+    return render_template('advance.html', zone=zone, start=start, end=end, days=days, stalls=stalls,
+                           today=today.isoformat(),
+                           bookings=advance.get_user_bookings(conn, session['user_id'], today.isoformat()),
+                           user_info=user_cache.get_user(conn, session['user_id']))
+
+@app.route('/advance/book', methods=['POST'])
+def advance_book():
+    if 'user_id' not in session: return redirect('/login')
+
+    zone, start, end = request.form['zone'], request.form['start'], request.form['end']
+    back = url_for('advance_calendar', zone=zone, start=start, end=end)
+    payment_method = request.form.get('payment_method', 'transfer')
+    payment_ref = request.form.get('payment_ref', '')
+    if payment_method == 'transfer' and not payment_ref:
+        flash('กรุณากรอกข้อมูลการโอนเงิน', 'warning')
+        return redirect(back)
+
+    rollover.ensure_today(db.get_pool())
+    try:
+        days = advance_days(start, end)
+        outcome = advance.reserve(get_db(), request.form['stall_id'], session['user_id'], request.form['shop_name'],
+                                  request.form['phone'], request.form['category'], days,
+                                  payment_ref=payment_ref, pay_with_credit=(payment_method == 'credit'))
+    except ValueError:
+        flash(f'ช่วงวันที่ไม่ถูกต้อง (จองล่วงหน้าได้ตั้งแต่พรุ่งนี้ ไม่เกิน {advance.WINDOW_DAYS - 1} วัน)', 'warning')
+        return redirect(back)
+
+    if outcome is BookingOutcome.BOOKED:
+        flash(f'จองล่วงหน้าสำเร็จ {len(days)} วัน!', 'success')
+    elif outcome is BookingOutcome.INSUFFICIENT_CREDIT:
+        flash('เครดิตไม่พอ กรุณาเติมเงิน', 'danger')
+    else:
+        flash('ไม่ทัน! ล็อคนี้ถูกจองไปแล้วบางวันในช่วงที่เลือก', 'danger')
+    return redirect(back)
+
+@app.route('/advance/cancel/<int:booking_id>')
+def advance_cancel(booking_id):
+    if 'user_id' not in session: return redirect('/login')
+
+    refund = advance.cancel(get_db(), booking_id, session['user_id'], get_now_thai().strftime('%Y-%m-%d'),
+                            is_admin=session['role'] == 'admin')
+    if refund is not None:
+        flash(f'ยกเลิกสำเร็จ! คืนเครดิต {refund} บาท', 'warning')
+    return redirect(url_for('advance_calendar'))
+
 # --- ระบบยกเลิกจอง ---
 @app.route('/cancel_booking/<int:stall_id>')
 def cancel_booking(stall_id):
@@ -168,35 +340,25 @@ def cancel_booking(stall_id):
         flash(f'ไม่สามารถยกเลิกได้! (ต้องยกเลิกก่อนเวลา {info["cancel_deadline_str"]})', 'danger')
         return redirect('/')
 
-    conn = get_db()
-    stall = conn.execute("SELECT * FROM stalls WHERE id=?", (stall_id,)).fetchone()
-    
-    if stall and (stall['booked_by'] == session['user_id'] or session['role'] == 'admin'):
-        refund = stall['price']
-        conn.execute("UPDATE users SET credit = credit + ? WHERE id=?", (refund, stall['booked_by']))
-        conn.execute("""
-            UPDATE stalls 
-            SET status='available', shop_name='', phone='', product_category='', booking_date='', booked_by=NULL, payment_ref='', payment_status='pending' 
-            WHERE id=?
-        """, (stall_id,))
-        conn.commit()
+    refund = booking.cancel(get_db(), stall_id, session['user_id'], is_admin=session['role'] == 'admin')
+    if refund is not None:
         flash(f'ยกเลิกสำเร็จ! คืนเครดิต {refund} บาท', 'warning')
     
-    conn.close()
     return redirect('/')
 
 # --- Admin Dashboard ---
+USERS_PAGE_SIZE = 50
+
 @app.route('/admin')
 def admin_dashboard():
     if session.get('role') != 'admin': 
         flash('สำหรับผู้ดูแลระบบเท่านั้น', 'danger')
         return redirect('/')
         
-    conn = get_db()
-    # ข้อมูลสรุป
-    total_sales = conn.execute("SELECT SUM(price) FROM stalls WHERE status='booked'").fetchone()[0] or 0
-    total_booked = conn.execute("SELECT COUNT(*) FROM stalls WHERE status='booked'").fetchone()[0]
-    total_users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    # อ่านจาก connection read-only (หรือสำเนา) แยกจากทางเขียนของการจอง
+    conn = get_report_db()
+    # ข้อมูลสรุป (อ่านจากตาราง counters ที่ trigger อัปเดตให้)
+    totals = counters.get_counters(conn)
     
     # ดึงข้อมูลการจอง + ชื่อคนจอง
     bookings = conn.execute("""
@@ -207,29 +369,116 @@ def admin_dashboard():
         ORDER BY zone, name
     """).fetchall()
 
-    # ดึงรายชื่อ User ทั้งหมดมาแสดง
-    all_users = conn.execute("SELECT * FROM users ORDER BY id").fetchall()
+    # รายชื่อ User ทีละหน้า (keyset ตาม id) + กรองชื่อ/role
+    user_q = request.args.get('user_q', '').strip()
+    role = request.args.get('role', '')
+    after = request.args.get('after', 0, type=int)
+    where, params = ["users.id > ?"], [after]
+    if user_q:
+        where.append("username LIKE ?")
+        params.append('%' + user_q + '%')
+    if role in ('admin', 'user'):
+        where.append("role = ?")
+        params.append(role)
+    all_users = conn.execute(f"{credits.USER_SELECT} WHERE {' AND '.join(where)} ORDER BY users.id LIMIT ?",
+                             params + [USERS_PAGE_SIZE]).fetchall()
+    next_after = all_users[-1]['id'] if len(all_users) == USERS_PAGE_SIZE else None
+    
+    # สรุปย้อนหลัง 7 วัน (อ่านจาก daily_rollups)
+    daily_totals = ledger.get_daily_totals(conn)
     
-    conn.close()
-    return render_template('admin.html', total_sales=total_sales, total_booked=total_booked, 
-                           total_users=total_users, bookings=bookings, all_users=all_users)
+    return render_template('admin.html', total_sales=totals['total_sales'], total_booked=totals['total_booked'], 
+                           total_users=totals['total_users'], bookings=bookings, all_users=all_users,
+                           daily_totals=daily_totals, request_key=uuid.uuid4().hex,
+                           user_q=user_q, role=role, after=after, next_after=next_after)
+
+# --- Admin Export (CSV / NDJSON แบบ stream, ?gzip=1 เพื่อบีบอัด) ---
+@app.route('/admin/export/<dataset>.<fmt>')
+def admin_export(dataset, fmt):
+    if session.get('role') != 'admin': return redirect('/')
+    if dataset not in exports.DATASETS or fmt not in exports.FORMATS:
+        abort(404)
+
+    gzip = request.args.get('gzip') == '1'
+    filename = f"{dataset}-{get_now_thai().strftime('%Y%m%d')}.{fmt}" + ('.gz' if gzip else '')
+    return Response(exports.export(db.get_report_pool(), dataset, fmt, gzip=gzip),
+                    mimetype='application/gzip' if gzip else exports.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# --- Admin Report: รายได้ / การใช้ล็อค รายวันต่อโซน ---
+@app.route('/admin/report')
+def admin_report():
+    if session.get('role') != 'admin': return redirect('/')
+
+    today = get_now_thai()
+    start = request.args.get('from', (today - timedelta(days=30)).strftime('%Y-%m-%d'))
+    end = request.args.get('to', today.strftime('%Y-%m-%d'))
+    rows = ledger.get_report(get_report_db(), start, end)
+    return jsonify([dict(r) for r in rows])
 
 # --- Admin Edit Credit ---
 @app.route('/admin/update_credit', methods=['POST'])
 def admin_update_credit():
     if session.get('role') != 'admin': return redirect('/')
     
-    user_id = request.form['user_id']
-    new_credit = request.form['credit']
-    
+    # แปลงค่าก่อนเปิด write transaction ค่าผิดแค่แจ้งเตือน ไม่ถือ lock ไม่ 500
+    user_id = request.form.get('user_id', type=int)
+    new_credit = request.form.get('credit', type=int)
+    if user_id is None or new_credit is None or new_credit < 0:
+        flash('จำนวนเครดิตไม่ถูกต้อง', 'danger')
+        return redirect('/admin')
+
     conn = get_db()
-    conn.execute("UPDATE users SET credit = ? WHERE id = ?", (new_credit, user_id))
-    conn.commit()
-    conn.close()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        credits.set_balance(conn, user_id, new_credit, ref=f"admin:{session['user_id']}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     
     flash('อัปเดตเครดิตเรียบร้อย', 'success')
     return redirect('/admin')
 
+# --- Admin ปรับเครดิตหลายคนจากไฟล์ CSV (transaction เดียว) ---
+@app.route('/admin/bulk_credit', methods=['POST'])
+def admin_bulk_credit():
+    if session.get('role') != 'admin': return redirect('/')
+
+    upload = request.files.get('file')
+    try:
+        text = upload.read().decode('utf-8-sig') if upload else ''
+    except UnicodeDecodeError:
+        text = None
+    if not text:
+        flash('กรุณาเลือกไฟล์ CSV (UTF-8)', 'warning')
+        return redirect('/admin')
+
+    # ตรวจทั้งไฟล์ก่อน แล้วลงเฉพาะแถวที่ผ่านในครั้งเดียว
+    rows, rejected = credits.parse_adjustments(text.splitlines())
+    key = f"bulk:{session['user_id']}:{request.form.get('request_key') or uuid.uuid4().hex}"
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if credits.batch_applied(conn, key):
+            conn.rollback()
+            flash('ไฟล์นี้ปรับเครดิตไปแล้ว', 'warning')
+            return redirect('/admin')
+        applied, invalid = credits.apply_adjustments(conn, rows, ref=f"admin:{session['user_id']}", key_prefix=key)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    rejected = sorted(rejected + invalid)
+    flash(f'ปรับเครดิตสำเร็จ {len(applied)} รายการ (รวม {sum(a[3] for a in applied):+d} บาท), '
+          f'ปฏิเสธ {len(rejected)} แถว', 'success' if not rejected else 'warning')
+    for line, reason in rejected[:20]:
+        flash(f'แถว {line}: {reason}', 'danger')
+    if len(rejected) > 20:
+        flash(f'... และอีก {len(rejected) - 20} แถว', 'danger')
+    return redirect('/admin')
+
 # --- Auth: Login & Register ---
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -237,9 +486,19 @@ def login():
         username = request.form['username']
         password = request.form['password']
         conn = get_db()
-        user = conn.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password)).fetchone()
-        conn.close()
-        if user:
+        user = conn.execute(credits.USER_SELECT + " WHERE username = ?", (username,)).fetchone()
+        try:
+            hasher = passwords.get_hasher()
+            ok, needs_rehash = hasher.verify(user['password'], password) if user else hasher.verify_missing(password)
+            if needs_rehash:
+                # plaintext เดิม / work factor เก่า -> hash ใหม่ตามค่าปัจจุบัน
+                conn.execute("UPDATE users SET password = ? WHERE id = ?",
+                             (hasher.hash(password), user['id']))
+                conn.commit()
+        except PasswordBusy:
+            flash('ระบบกำลังยุ่ง กรุณาลองใหม่อีกครั้ง', 'warning')
+            return render_template('login.html'), 503
+        if ok:
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['role'] = user['role']
@@ -255,17 +514,21 @@ def register():
         username = request.form['username']
         password = request.form['password']
         
+        try:
+            password_hash = passwords.get_hasher().hash(password)
+        except PasswordBusy:
+            flash('ระบบกำลังยุ่ง กรุณาลองใหม่อีกครั้ง', 'warning')
+            return render_template('register.html'), 503
+
         conn = get_db()
         try:
             # สมัครใหม่แจกเครดิต 0 บาท (หรือจะแจกฟรีแก้เลขตรงนี้)
-            conn.execute("INSERT INTO users (username, password, role, credit) VALUES (?, ?, 'user', 0)", (username, password))
+            conn.execute("INSERT INTO users (username, password, role, credit) VALUES (?, ?, 'user', 0)", (username, password_hash))
             conn.commit()
             flash('สมัครสมาชิกสำเร็จ! กรุณาเข้าสู่ระบบ', 'success')
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
             flash('ชื่อผู้ใช้นี้มีคนใช้แล้ว', 'danger')
-        finally:
-            conn.close()
             
     return render_template('register.html')
 
@@ -276,12 +539,22 @@ def logout():
 
 @app.route('/review', methods=['POST'])
 def add_review():
-    conn = get_db()
-    conn.execute("INSERT INTO reviews (shop_name, rating, comment, reviewer_name) VALUES (?, ?, ?, ?)",
-                 (request.form['shop_name'], request.form['rating'], request.form['comment'], session.get('username', 'Guest')))
-    conn.commit()
-    conn.close()
+    # คะแนนผิด (ไม่ใช่ตัวเลข / นอก 1-5) ห้ามเข้า review_totals / shop_ratings เพราะยอดสะสมแก้ย้อนหลังไม่ได้
+    rating = request.form.get('rating', type=int)
+    if rating not in range(1, 6) or not request.form.get('shop_name', '').strip():
+        flash('กรุณาให้คะแนน 1-5 ดาว และระบุชื่อร้าน', 'warning')
+        return redirect('/')
+    reviews.add_review(get_db(), request.form['shop_name'], rating,
+                       request.form['comment'], session.get('username', 'Guest'))
     return redirect('/')
 
+# --- รีวิวเก่า (โหลดเพิ่มทีละหน้า) ---
+@app.route('/reviews')
+def review_feed():
+    before = request.args.get('before', type=int)
+    rows = reviews.get_page(get_db(), before_id=before)
+    return jsonify([{'id': r['id'], 'shop_name': r['shop_name'], 'rating': r['rating'],
+                     'comment': r['comment']} for r in rows])
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
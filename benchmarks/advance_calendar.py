@@ -0,0 +1,94 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import advance
+from benchmarks.stats import percentile
+from booking import BookingOutcome
+from db import ConnectionPool
+from setup_db import generate_db
+
+# --- Benchmark ปฏิทินจองล่วงหน้า: "ล็อคไหนในโซนว่างครบทั้งช่วง" ---
+# bitmap (bits & mask ต่อล็อค จาก cache ใน memory) เทียบกับ NOT IN ไล่แถว advance_bookings ตามช่วงวัน
+
+ROW_SCAN_SQL = """
+    SELECT id FROM stalls WHERE zone=? AND id NOT IN (
+        SELECT stall_id FROM advance_bookings WHERE day BETWEEN ? AND ?
+    ) ORDER BY id
+"""
+
+
+def seed_reservations(pool, reservations, max_days, seed):
+    rng = random.Random(seed)
+    with pool.connection() as conn:
+        _, start = advance.get_calendar_state(conn)
+        stall_ids = [r[0] for r in conn.execute("SELECT id FROM stalls")]
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE role='user'")]
+        first = date.fromisoformat(start)
+        booked = 0
+        for _ in range(reservations):
+            offset = rng.randint(1, advance.WINDOW_DAYS - max_days)
+            days = [(first + timedelta(days=offset + i)).isoformat() for i in range(rng.randint(1, max_days))]
+            outcome = advance.reserve(conn, rng.choice(stall_ids), rng.choice(user_ids), 'bench', '0', 'x', days,
+                                      payment_ref='SLIP')
+            booked += outcome is BookingOutcome.BOOKED
+    return start, booked
+
+
+def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - started)
+    return result, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Advance-booking availability: bitmap vs row scan')
+    parser.add_argument('--stalls-per-zone', type=int, default=2000)
+    parser.add_argument('--reservations', type=int, default=20000)
+    parser.add_argument('--max-days', type=int, default=7, help='วันติดกันสูงสุดต่อการจองหนึ่งครั้ง')
+    parser.add_argument('--range-days', type=int, default=7, help='ช่วงวันที่ถาม')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--zone', default='IT Zone')
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'market.db')
+        generate_db(path, stalls_per_zone=args.stalls_per_zone, users=200, reviews=0, days=0, occupancy=0,
+                    hash_method='pbkdf2:sha256:1')
+        pool = ConnectionPool(path, size=1)
+        started = time.perf_counter()
+        start, booked = seed_reservations(pool, args.reservations, args.max_days, args.seed)
+        print(f">>> seeded {booked}/{args.reservations} reservations in {time.perf_counter() - started:.1f}s")
+
+        first = date.fromisoformat(start) + timedelta(days=7)
+        days = [(first + timedelta(days=i)).isoformat() for i in range(args.range_days)]
+        with pool.connection() as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM advance_bookings").fetchone()[0]
+            scan_ids, scan = timed(lambda: [r[0] for r in conn.execute(ROW_SCAN_SQL, (args.zone, days[0], days[-1]))],
+                                   args.repeat)
+            advance.free_stalls(conn, args.zone, days)       # โหลด cache ครั้งแรก
+            bitmap_stalls, bitmap = timed(lambda: advance.free_stalls(conn, args.zone, days), args.repeat)
+        pool.close_all()
+
+    bitmap_ids = [s['id'] for s in bitmap_stalls]
+    print(f">>> {args.zone}, {days[0]}..{days[-1]}: {len(bitmap_ids)} free stalls ({rows} advance_bookings rows)")
+    for name, latencies in (('row scan', scan), ('bitmap', bitmap)):
+        print(f"    {name:<9} p50={percentile(latencies, 50) * 1000:7.3f}ms  p99={percentile(latencies, 99) * 1000:7.3f}ms")
+    if bitmap_ids != scan_ids:
+        print(">>> FAILED: bitmap and row scan disagree")
+        sys.exit(1)
+    print(">>> OK: same stalls from both")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import booking
+from benchmarks.opening_rush import BALANCES_SQL, verify
+from booking import BookingOutcome
+from booking_queue import BookingQueue
+from db import ConnectionPool
+from setup_db import generate_db
+
+# --- Benchmark group commit: จองตรง (transaction ละคำขอ) เทียบกับคิวจองที่รวม commit เป็นก้อน ---
+# ใช้ล็อคเยอะพอให้คำขอส่วนใหญ่จองได้จริง (วัด commit ไม่ใช่การชนกัน)
+
+
+def prepare_db(path, stalls_per_zone, vendors, credit):
+    generate_db(path, stalls_per_zone=stalls_per_zone, users=vendors, reviews=0, days=0, occupancy=0,
+                credit=credit, hash_method='pbkdf2:sha256:1')
+    pool = ConnectionPool(path, size=1)
+    with pool.connection() as conn:
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE role='user'")]
+        stall_ids = [r[0] for r in conn.execute("SELECT id FROM stalls")]
+        balances = dict(conn.execute(BALANCES_SQL).fetchall())
+    pool.close_all()
+    return user_ids, stall_ids, balances
+
+
+def run(path, mode, threads, attempts, user_ids, stall_ids, seed, batch_size, synchronous):
+    pool = ConnectionPool(path, size=threads + 1, pragmas={'synchronous': synchronous})
+    queue = BookingQueue(pool, batch_size=batch_size) if mode == 'queue' else None
+    rng = random.Random(seed)
+    jobs = [(rng.choice(stall_ids), rng.choice(user_ids), rng.random() < 0.5) for _ in range(attempts)]
+    results = []
+    results_lock = threading.Lock()
+    start_gate = threading.Barrier(threads)
+
+    def worker(chunk):
+        conn = pool.acquire()
+        start_gate.wait()
+        local = []
+        for stall_id, user_id, with_credit in chunk:
+            args = (stall_id, user_id, f'shop-{user_id}', '081-000-0000', 'อาหาร', '2000-01-01')
+            if queue:
+                outcome = queue.book(*args, payment_ref='SLIP', pay_with_credit=with_credit)
+            else:
+                outcome = booking.book(conn, *args, payment_ref='SLIP', pay_with_credit=with_credit)
+            local.append((stall_id, user_id, with_credit, outcome))
+        pool.release(conn)
+        with results_lock:
+            results.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(jobs[i::threads],)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    booked = sum(1 for r in results if r[3] is BookingOutcome.BOOKED)
+    # โหมดตรง: 1 commit ต่อการจองที่สำเร็จ / โหมดคิว: 1 commit ต่อก้อน
+    commits = queue.batches if queue else booked
+    return pool, results, elapsed, commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Direct booking vs group-commit booking queue')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=3000)
+    parser.add_argument('--stalls-per-zone', type=int, default=2000)
+    parser.add_argument('--vendors', type=int, default=500)
+    parser.add_argument('--credit', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--synchronous', default='NORMAL', help='PRAGMA synchronous (FULL = fsync ทุก commit)')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    failed = False
+    for mode in ('direct', 'queue'):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'market.db')
+            user_ids, stall_ids, balances = prepare_db(path, args.stalls_per_zone, args.vendors, args.credit)
+            pool, results, elapsed, commits = run(path, mode, args.threads, args.attempts, user_ids, stall_ids,
+                                                  args.seed, args.batch_size, args.synchronous)
+            errors = verify(pool, results, balances)
+            pool.close_all()
+
+        outcomes = Counter(r[3].value for r in results)
+        booked = outcomes.get(BookingOutcome.BOOKED.value, 0)
+        print(f">>> {mode:<6} {len(results)} attempts, {args.threads} threads, synchronous={args.synchronous}: "
+              f"{elapsed:.3f}s")
+        print(f"    {booked / elapsed:8.0f} bookings/s  {commits / elapsed:8.0f} commits/s  "
+              f"({commits} commits, {booked / max(commits, 1):.1f} bookings/commit)")
+        print("    " + ', '.join(f'{name}={count}' for name, count in sorted(outcomes.items())))
+        if errors:
+            failed = True
+            print(">>> FAILED")
+            for e in errors[:20]:
+                print(f"    {e}")
+    if failed:
+        sys.exit(1)
+    print(">>> OK: no double booking, credit balances consistent in both modes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.stats import percentile
+
+# --- Benchmark login: p50/p99 latency ตอนคนแห่ login พร้อมกัน (hash ช้า + pool จำกัด) ---
+# ระหว่างนั้นยิง request อ่านเบาๆ (/reviews) คู่ขนาน เพื่อดูว่า request อื่นไม่โดนแย่ง CPU จนค้าง
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login latency under concurrency')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--logins', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=2, help='PASSWORD_WORKERS')
+    parser.add_argument('--method', default='pbkdf2:sha256:600000', help='PASSWORD_HASH_METHOD')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['MARKET_DATABASE'] = os.path.join(tmp, 'market.db')
+    os.environ['MARKET_PASSWORD_WORKERS'] = str(args.workers)
+    os.environ['MARKET_PASSWORD_HASH_METHOD'] = args.method
+    os.environ['MARKET_PASSWORD_MAX_PENDING'] = str(args.concurrency * 2)
+    os.environ['MARKET_RATELIMIT_ENABLED'] = 'false'   # login ทั้งหมดมาจาก IP เดียว
+    from app import app
+
+    # hash ครั้งเดียวใช้กับทุก user (benchmark วัดการ verify ไม่ใช่การ seed)
+    password_hash = generate_password_hash('1234', args.method)
+    conn = sqlite3.connect(app.config['DATABASE'])
+    conn.executemany("INSERT INTO users (username, password, role) VALUES (?, ?, 'user')",
+                     [(f'vendor{i:04d}', password_hash) for i in range(args.users)])
+    conn.commit()
+    conn.close()
+
+    latencies, busy = [], []
+    lock = threading.Lock()
+
+    def login(i):
+        client = app.test_client()
+        started = time.perf_counter()
+        r = client.post('/login', data={'username': f'vendor{i % args.users:04d}', 'password': '1234'})
+        elapsed = time.perf_counter() - started
+        with lock:
+            (busy if r.status_code == 503 else latencies).append(elapsed)
+
+    probe_latencies = []
+    stop = threading.Event()
+
+    def probe():
+        client = app.test_client()
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get('/reviews')
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    def ms(v):
+        return f'{v * 1000:.1f}ms'
+
+    print(f">>> {args.logins} logins, concurrency {args.concurrency}, {args.workers} hash workers, {args.method}")
+    print(f">>> Throughput: {len(latencies) / elapsed:.1f} logins/s ({len(busy)} rejected as busy)")
+    print(f"    login  p50 {ms(percentile(latencies, 50))}  p99 {ms(percentile(latencies, 99))}")
+    print(f"    probe  p50 {ms(percentile(probe_latencies, 50))}  p99 {ms(percentile(probe_latencies, 99))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import booking
+import credits
+from booking import BookingOutcome
+from db import ConnectionPool
+from setup_db import create_db
+
+# --- Stress test ช่วง 11:00: ยิงจองพร้อมกันหลายร้อยครั้งใส่ 36 ล็อค แล้วเช็คว่าไม่มีการจองซ้ำ ---
+
+BALANCES_SQL = """
+    SELECT users.id, COALESCE(b.snapshot + b.delta, 0) FROM users
+    LEFT JOIN credit_balances b ON b.user_id = users.id
+"""
+
+
+def prepare_db(path, vendors, credit):
+    create_db(path)
+    pool = ConnectionPool(path, size=1)
+    with pool.connection() as conn:
+        conn.execute("""
+            UPDATE stalls
+            SET status='available', shop_name='', phone='', product_category='',
+                booked_by=NULL, booking_date='', payment_ref='', payment_status='pending'
+        """)
+        conn.executemany("INSERT INTO users (username, password, role) VALUES (?, '1234', 'user')",
+                         [(f'vendor{i:03d}',) for i in range(vendors)])
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'vendor%'")]
+        for user_id in user_ids:
+            credits.post(conn, user_id, credit, 'topup')
+        conn.commit()
+        stall_ids = [r[0] for r in conn.execute("SELECT id FROM stalls")]
+        balances = dict(conn.execute(BALANCES_SQL).fetchall())
+    pool.close_all()
+    return user_ids, stall_ids, balances
+
+
+def run(path, threads, attempts, user_ids, stall_ids, seed):
+    pool = ConnectionPool(path, size=threads)
+    rng = random.Random(seed)
+    jobs = [(rng.choice(stall_ids), rng.choice(user_ids), rng.random() < 0.5) for _ in range(attempts)]
+    results = []
+    results_lock = threading.Lock()
+    start_gate = threading.Barrier(threads)
+
+    def worker(chunk):
+        conn = pool.acquire()
+        start_gate.wait()
+        local = []
+        for stall_id, user_id, with_credit in chunk:
+            outcome = booking.book(conn, stall_id, user_id, f'shop-{user_id}', '081-000-0000', 'อาหาร',
+                                   '2000-01-01', payment_ref='SLIP', pay_with_credit=with_credit)
+            local.append((stall_id, user_id, with_credit, outcome))
+        pool.release(conn)
+        with results_lock:
+            results.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(jobs[i::threads],)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    return pool, results, elapsed
+
+
+def verify(pool, results, credits_before):
+    errors = []
+    booked = [r for r in results if r[3] is BookingOutcome.BOOKED]
+    per_stall = Counter(r[0] for r in booked)
+    errors += [f'stall {s} booked {n} times' for s, n in per_stall.items() if n > 1]
+
+    with pool.connection() as conn:
+        rows = {r['id']: r for r in conn.execute("SELECT id, price, status, booked_by, payment_ref FROM stalls")}
+        credits_after = dict(conn.execute(BALANCES_SQL).fetchall())
+        journal = dict(conn.execute("SELECT user_id, SUM(delta) FROM credit_journal GROUP BY user_id").fetchall())
+
+    for stall_id, user_id, with_credit, _ in booked:
+        row = rows[stall_id]
+        if row['status'] != 'booked' or row['booked_by'] != user_id:
+            errors.append(f'stall {stall_id} owner mismatch')
+    for stall_id, row in rows.items():
+        if row['status'] == 'booked' and stall_id not in per_stall:
+            errors.append(f'stall {stall_id} booked without a winning request')
+
+    spent = Counter()
+    for stall_id, user_id, with_credit, _ in booked:
+        if with_credit:
+            spent[user_id] += rows[stall_id]['price']
+    for user_id, before in credits_before.items():
+        after = credits_after[user_id]
+        if after < 0:
+            errors.append(f'user {user_id} has negative credit {after}')
+        if journal.get(user_id, 0) != after:
+            errors.append(f'user {user_id} balance {after} does not match journal {journal.get(user_id, 0)}')
+        if before - after != spent[user_id]:
+            errors.append(f'user {user_id} credit {before} -> {after}, expected spend {spent[user_id]}')
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Opening-rush booking stress test')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=600)
+    parser.add_argument('--vendors', type=int, default=60)
+    parser.add_argument('--credit', type=int, default=400, help='เครดิตเริ่มต้นต่อร้าน (พอจอง 1 ล็อค 300 บาท แต่ไม่พอ IT Zone)')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'market.db')
+        user_ids, stall_ids, balances = prepare_db(path, args.vendors, args.credit)
+        pool, results, elapsed = run(path, args.threads, args.attempts, user_ids, stall_ids, args.seed)
+        errors = verify(pool, results, balances)
+        pool.close_all()
+
+    outcomes = Counter(r[3].value for r in results)
+    print(f">>> {len(results)} attempts on {len(stall_ids)} stalls with {args.threads} threads in {elapsed:.3f}s")
+    print(f">>> Throughput: {len(results) / elapsed:.0f} bookings/s")
+    for name, count in sorted(outcomes.items()):
+        print(f"    {name:<20} {count}")
+    if errors:
+        print(">>> FAILED")
+        for e in errors[:20]:
+            print(f"    {e}")
+        sys.exit(1)
+    print(">>> OK: no double booking, credit balances consistent")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from benchmarks.seed import CATEGORIES, SHOPS, VENDOR_PASSWORD, ZONES, vendor_name
+
+# --- สถานการณ์จำลอง: แต่ละ action คืน (ชื่อ route, method, path, form data) ---
+# ctx คือ dict ของ virtual user หนึ่งคน: rng, index, stall_ids, vendors
+
+
+def index(ctx):
+    return '/', 'GET', f"/?zone={ctx['rng'].choice(ZONES)[0]}", None
+
+
+def search(ctx):
+    return '/?q=', 'GET', f"/?q={ctx['rng'].choice(SHOPS)}", None
+
+
+def review_feed(ctx):
+    return '/reviews', 'GET', '/reviews', None
+
+
+def book(ctx):
+    rng = ctx['rng']
+    stall_id = rng.choice(ctx['stall_ids'])
+    ctx['booked'].append(stall_id)
+    return '/book', 'POST', '/book', {
+        'stall_id': stall_id, 'shop_name': rng.choice(SHOPS), 'phone': '081-000-0000',
+        'category': rng.choice(CATEGORIES), 'current_zone': ZONES[0][0], 'payment_method': 'credit',
+    }
+
+
+def cancel(ctx):
+    stall_id = ctx['booked'].pop() if ctx['booked'] else ctx['rng'].choice(ctx['stall_ids'])
+    return '/cancel_booking', 'GET', f'/cancel_booking/{stall_id}', None
+
+
+def topup(ctx):
+    return '/topup', 'POST', '/topup', {'amount': 100}
+
+
+def review(ctx):
+    rng = ctx['rng']
+    return '/review', 'POST', '/review', {'shop_name': rng.choice(SHOPS), 'rating': rng.randint(1, 5),
+                                          'comment': 'benchmark'}
+
+
+def login(ctx):
+    username = vendor_name(ctx['rng'].randrange(ctx['vendors']))
+    return '/login', 'POST', '/login', {'username': username, 'password': VENDOR_PASSWORD}
+
+
+def admin(ctx):
+    return '/admin', 'GET', '/admin', None
+
+
+def admin_report(ctx):
+    return '/admin/report', 'GET', '/admin/report', None
+
+
+def admin_export(ctx):
+    return '/admin/export', 'GET', '/admin/export/bookings.csv', None
+
+
+# (น้ำหนัก, action) และผู้ใช้ที่ login ก่อนเริ่ม ('vendor' / 'admin')
+SCENARIOS = {
+    # 11:00 เปิดจอง: ทุกคนแย่งกดจอง + รีเฟรชหน้าแรก
+    'opening_rush': {
+        'role': 'vendor',
+        'mix': [(55, book), (25, index), (5, cancel), (5, topup), (5, login), (5, review_feed)],
+    },
+    # บ่าย: เดินดูร้าน ค้นหา อ่าน/เขียนรีวิว
+    'browse_afternoon': {
+        'role': 'vendor',
+        'mix': [(45, index), (15, search), (15, review_feed), (10, review), (5, login), (5, topup),
+                (5, book)],
+    },
+    # admin เปิด dashboard / รายงาน / export
+    'admin_reporting': {
+        'role': 'admin',
+        'mix': [(40, admin), (25, admin_report), (10, admin_export), (20, index), (5, cancel)],
+    },
+}
@@ -0,0 +1,18 @@
+from setup_db import FAKE_SHOPS as SHOPS, ZONES, generate_db
+
+# --- ฐานข้อมูลสำหรับ benchmark (ปรับขนาดได้) ---
+# ใช้ setup_db.generate_db ล็อคว่างทั้งหมดตอนเริ่ม (เหมือนก่อนเปิดจอง 11:00)
+# ทุกคนใช้ hash เดียวกัน (รหัส VENDOR_PASSWORD)
+
+VENDOR_PASSWORD = '1234'
+CATEGORIES = ['อาหาร', 'เสื้อผ้า', 'ของใช้']
+
+
+def vendor_name(i):
+    return f'vendor{i:05d}'
+
+
+def seed(path, vendors=500, stalls_per_zone=12, reviews=2000, credit=5000,
+         hash_method='pbkdf2:sha256:600000', seed=42):
+    return generate_db(path, zones=len(ZONES), stalls_per_zone=stalls_per_zone, users=vendors, reviews=reviews,
+                       occupancy=0, seed=seed, password=VENDOR_PASSWORD, hash_method=hash_method, credit=credit)
@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.seed import VENDOR_PASSWORD, seed, vendor_name
+from benchmarks.stats import summarize
+
+# --- Benchmark ทุก route: seed DB -> เล่นสถานการณ์จำลอง -> throughput + p50/p95/p99 ต่อ route ---
+# ยิงผ่าน Flask test client (ในโปรเซสเดียว) หรือ gunicorn ที่เปิดขึ้นมาเองบนเครื่อง (--driver http)
+# บันทึกผลเป็น JSON และเทียบกับ baseline ได้ (exit code 1 ถ้าช้าลงเกิน --threshold)
+#
+#   python -m benchmarks --scenario opening_rush --duration 30 --out results.json --baseline baseline.json
+
+
+class TestClientDriver:
+
+    def __init__(self):
+        from app import app
+        self.app = app
+
+    def client(self):
+        client = self.app.test_client()
+
+        def send(method, path, data=None):
+            # อ่าน body ให้จบ (export เป็น stream ถ้าไม่อ่านจะวัดแค่ header)
+            r = client.open(path, method=method, data=data)
+            r.get_data()
+            r.close()
+            return r.status_code
+        return send
+
+    def close(self):
+        pass
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+
+    def __init__(self, base_url=None, workers=2):
+        self.process = None
+        if base_url is None:
+            base_url = self._start_gunicorn(workers)
+        self.base_url = base_url.rstrip('/')
+
+    def _start_gunicorn(self, workers):
+        if not shutil.which('gunicorn'):
+            sys.exit('ไม่พบ gunicorn (pip install gunicorn) หรือระบุ --url ของเซิร์ฟเวอร์ที่รันอยู่แล้ว')
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        self.process = subprocess.Popen(['gunicorn', '-w', str(workers), '--threads', '4',
+                                         '-b', f'127.0.0.1:{port}', 'app:app'], cwd=ROOT)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return f'http://127.0.0.1:{port}'
+            except OSError:
+                time.sleep(0.2)
+        self.close()
+        sys.exit('gunicorn ไม่ขึ้นภายใน 30 วินาที')
+
+    def client(self):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+        def send(method, path, data=None):
+            body = urllib.parse.urlencode(data).encode() if data is not None else None
+            req = urllib.request.Request(self.base_url + urllib.parse.quote(path, safe='/?=&'),
+                                         data=body, method=method)
+            try:
+                with opener.open(req, timeout=30) as r:
+                    r.read()
+                    return r.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return send
+
+    def close(self):
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+
+
+def run_scenario(driver, scenario, duration, concurrency, vendors, stall_ids, seed_value):
+    weights, actions = zip(*scenario['mix'])
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    start_gate = threading.Barrier(concurrency + 1)
+    stop_at = []
+
+    def user(i):
+        ctx = {'rng': random.Random(seed_value + i), 'index': i, 'vendors': vendors,
+               'stall_ids': stall_ids, 'booked': []}
+        send = driver.client()
+        username = 'admin' if scenario['role'] == 'admin' else vendor_name(i % vendors)
+        send('POST', '/login', {'username': username, 'password': VENDOR_PASSWORD})
+        local, local_errors = defaultdict(list), defaultdict(int)
+        start_gate.wait()
+        while time.perf_counter() < stop_at[0]:
+            route, method, path, data = ctx['rng'].choices(actions, weights)[0](ctx)
+            started = time.perf_counter()
+            status = send(method, path, data)
+            elapsed = time.perf_counter() - started
+            if status >= 400:
+                local_errors[route] += 1
+            else:
+                local[route].append(elapsed)
+        with lock:
+            for route, values in local.items():
+                samples[route].extend(values)
+            for route, count in local_errors.items():
+                errors[route] += count
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    stop_at.append(time.perf_counter() + duration)
+    start_gate.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {route: summarize(samples[route], elapsed, errors[route])
+              for route in sorted(set(samples) | set(errors))}
+    routes['(all)'] = summarize([v for values in samples.values() for v in values], elapsed,
+                                sum(errors.values()))
+    return routes
+
+
+def compare(results, baseline, threshold):
+    # คืนรายการ route ที่แย่ลงเกิน threshold (p95 สูงขึ้น หรือ throughput ลดลง)
+    regressions = []
+    print(f"\n{'route':<18}{'p95 base':>10}{'p95 now':>10}{'tput base':>11}{'tput now':>10}")
+    for route, now in results['routes'].items():
+        base = baseline['routes'].get(route)
+        if not base:
+            continue
+        slower = base['p95_ms'] and now['p95_ms'] > base['p95_ms'] * (1 + threshold)
+        fewer = base['throughput'] and now['throughput'] < base['throughput'] * (1 - threshold)
+        mark = '  <-- regression' if slower or fewer else ''
+        print(f"{route:<18}{base['p95_ms']:>10}{now['p95_ms']:>10}{base['throughput']:>11}{now['throughput']:>10}{mark}")
+        if mark:
+            regressions.append(route)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Market Hub route benchmark')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='opening_rush')
+    parser.add_argument('--duration', type=float, default=10.0, help='วินาที')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--driver', choices=['testclient', 'http'], default='testclient')
+    parser.add_argument('--url', help='ใช้กับ --driver http: ยิงเซิร์ฟเวอร์ที่รันอยู่แล้ว (ต้อง seed เอง)')
+    parser.add_argument('--gunicorn-workers', type=int, default=2)
+    parser.add_argument('--vendors', type=int, default=500)
+    parser.add_argument('--stalls-per-zone', type=int, default=12)
+    parser.add_argument('--reviews', type=int, default=2000)
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:600000')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--ratelimit', action='store_true', help='เปิด rate limit ตอนวัด (ปกติปิด ทุก virtual user มาจาก IP เดียว)')
+    parser.add_argument('--out', help='บันทึกผลเป็น JSON')
+    parser.add_argument('--baseline', help='JSON ผลครั้งก่อนไว้เทียบ')
+    parser.add_argument('--update-baseline', action='store_true', help='เขียนผลครั้งนี้ทับ --baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='ยอมให้แย่ลงได้กี่ส่วน (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'market.db')
+    if not args.url:
+        seed(path, vendors=args.vendors, stalls_per_zone=args.stalls_per_zone, reviews=args.reviews,
+             hash_method=args.hash_method, seed=args.seed)
+    os.environ['MARKET_DATABASE'] = path
+    os.environ['MARKET_PASSWORD_HASH_METHOD'] = args.hash_method
+    os.environ.setdefault('MARKET_PASSWORD_MAX_PENDING', str(args.concurrency * 2))
+    os.environ['MARKET_RATELIMIT_ENABLED'] = 'true' if args.ratelimit else 'false'
+
+    driver = (HttpDriver(args.url, args.gunicorn_workers) if args.driver == 'http' else TestClientDriver())
+    stall_ids = list(range(1, 3 * args.stalls_per_zone + 1))
+    try:
+        routes = run_scenario(driver, SCENARIOS[args.scenario], args.duration, args.concurrency,
+                              args.vendors, stall_ids, args.seed)
+    finally:
+        driver.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    results = {'scenario': args.scenario, 'driver': args.driver, 'duration': args.duration,
+               'concurrency': args.concurrency, 'vendors': args.vendors, 'reviews': args.reviews,
+               'routes': routes}
+
+    print(f">>> {args.scenario}: {args.duration:g}s, concurrency {args.concurrency}, driver {args.driver}")
+    print(f"{'route':<18}{'count':>8}{'err':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for route, s in routes.items():
+        print(f"{route:<18}{s['count']:>8}{s['errors']:>6}{s['throughput']:>9}"
+              f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('scenario') != args.scenario:
+            print(f"!!! baseline เป็นของ {baseline.get('scenario')} ไม่ใช่ {args.scenario}")
+        regressions = compare(results, baseline, args.threshold)
+    elif args.baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f">>> บันทึก baseline ที่ {args.baseline}")
+
+    if regressions:
+        print(f"!!! ช้าลงเกิน {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import threading
+
+# --- Cache ผังล็อคแยกตามโซน ---
+# ทุก write path (จอง / ยกเลิก / reset รายวัน) ต้องเรียก bump_board_version ใน transaction เดียวกัน
+# แต่ละ worker เช็คเลข version จาก DB (query เล็กมาก) ถ้าไม่เปลี่ยนก็ใช้ snapshot เดิม
+
+_snapshots = {}                 # zone -> (version, stalls) สลับทั้ง tuple ทีเดียว ผู้อ่านจะไม่เห็นครึ่งๆ กลางๆ
+_board = (None, {})             # ทุกโซนรวมกัน (version, zones)
+_lock = threading.Lock()
+
+
+def bump_board_version(conn):
+    conn.execute("""
+        INSERT INTO app_state (key, value) VALUES ('board_version', 1)
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+    """)
+
+
+def get_board_version(conn):
+    row = conn.execute("SELECT value FROM app_state WHERE key='board_version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def load_zone(conn, zone):
+    # ใช้ index stalls(zone) อ่านเฉพาะโซนที่กำลังดู
+    return [dict(stall) for stall in conn.execute("SELECT * FROM stalls WHERE zone=? ORDER BY id", (zone,))]
+
+
+def get_zone(conn, zone, version=None):
+    if version is None:
+        version = get_board_version(conn)
+    cached = _snapshots.get(zone)
+    if cached and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _snapshots.get(zone)
+        if cached and cached[0] == version:
+            return cached[1]
+        stalls = load_zone(conn, zone)
+        if stalls:
+            # ไม่ cache ชื่อโซนที่ไม่มีจริง (กัน dict โตจาก query string มั่วๆ)
+            _snapshots[zone] = (version, stalls)
+        return stalls
+
+
+def get_board(conn, version=None):
+    # ทุกโซน {zone: [stall, ...]} ใช้กับ API ที่ไม่ระบุโซน
+    global _board
+    if version is None:
+        version = get_board_version(conn)
+    cached_version, zones = _board
+    if cached_version == version:
+        return zones
+    with _lock:
+        if _board[0] != version:
+            zones = {}
+            for stall in conn.execute("SELECT * FROM stalls ORDER BY id"):
+                zones.setdefault(stall['zone'], []).append(dict(stall))
+            _board = (version, zones)
+        return _board[1]
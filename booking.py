@@ -0,0 +1,110 @@
+import sqlite3
+from enum import Enum
+
+import credits
+from board_cache import bump_board_version
+from ledger import record_booking, record_cancel
+
+# --- Booking Engine: จอง/ยกเลิกแบบ atomic กันจองซ้ำและตัดเครดิตซ้ำ ---
+
+
+class BookingOutcome(Enum):
+    BOOKED = 'booked'
+    TAKEN = 'taken'
+    INSUFFICIENT_CREDIT = 'insufficient_credit'
+    NOT_FOUND = 'not_found'
+
+
+def book(conn, stall_id, user_id, shop_name, phone, category, booking_date,
+         payment_ref='', pay_with_credit=False):
+    # จองล็อคด้วย conditional UPDATE (WHERE status='available') + ตัดเครดิต ใน transaction เดียว
+    # วันที่มีคนจองล่วงหน้าไว้แล้ว (advance_bookings) จองหน้างานไม่ได้ แม้แถว stalls ยังว่าง
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        outcome = _claim(conn, stall_id, user_id, shop_name, phone, category, booking_date,
+                         'CREDIT' if pay_with_credit else payment_ref, pay_with_credit)
+        if outcome is BookingOutcome.BOOKED:
+            conn.commit()
+        else:
+            conn.rollback()
+        return outcome
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def book_many(conn, requests):
+    # group commit: หลายคำขอ (tuple อาร์กิวเมนต์ของ book() ไม่รวม conn) ใน transaction เดียว
+    # ทำตามลำดับที่เข้ามา มาก่อนได้ก่อน แต่ละคำขอมี SAVEPOINT ของตัวเอง ที่ไม่สำเร็จถอยเฉพาะของมัน
+    # คืน list ผลตามลำดับ (BookingOutcome หรือ sqlite3.Error ของคำขอนั้น)
+    results = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for (stall_id, user_id, shop_name, phone, category, booking_date,
+             payment_ref, pay_with_credit) in requests:
+            conn.execute("SAVEPOINT booking")
+            try:
+                outcome = _claim(conn, stall_id, user_id, shop_name, phone, category, booking_date,
+                                 'CREDIT' if pay_with_credit else payment_ref, pay_with_credit)
+            except sqlite3.Error as e:
+                outcome = e
+            if outcome is not BookingOutcome.BOOKED:
+                conn.execute("ROLLBACK TO booking")
+            conn.execute("RELEASE booking")
+            results.append(outcome)
+        conn.commit()
+        return results
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _claim(conn, stall_id, user_id, shop_name, phone, category, booking_date, payment_ref, pay_with_credit):
+    # ต้องอยู่ใน transaction ที่เปิดไว้แล้ว ไม่ commit เอง
+    claimed = conn.execute("""
+        UPDATE stalls
+        SET status='booked', shop_name=?, phone=?, product_category=?, booked_by=?, booking_date=?, payment_ref=?, payment_status='paid'
+        WHERE id=? AND status='available'
+          AND NOT EXISTS (SELECT 1 FROM advance_bookings WHERE stall_id=? AND day=?)
+    """, (shop_name, phone, category, user_id, booking_date, payment_ref, stall_id, stall_id, booking_date)).rowcount
+    if not claimed:
+        exists = conn.execute("SELECT 1 FROM stalls WHERE id=?", (stall_id,)).fetchone()
+        return BookingOutcome.TAKEN if exists else BookingOutcome.NOT_FOUND
+
+    if pay_with_credit:
+        # ถือ write lock อยู่แล้ว อ่านยอดแล้วลงรายการได้เลยไม่มีใครแทรก
+        price = conn.execute("SELECT price FROM stalls WHERE id=?", (stall_id,)).fetchone()[0]
+        if credits.balance(conn, user_id) < price:
+            return BookingOutcome.INSUFFICIENT_CREDIT
+        credits.post(conn, user_id, -price, 'booking', ref=f'stall:{stall_id}:{booking_date}')
+    record_booking(conn, stall_id, user_id, booking_date)
+    bump_board_version(conn)
+    return BookingOutcome.BOOKED
+
+
+def cancel(conn, stall_id, user_id, is_admin=False):
+    # คืนค่าเงินที่คืนให้ผู้จอง หรือ None ถ้ายกเลิกไม่ได้ (ไม่ใช่เจ้าของ / ถูกยกเลิกไปแล้ว)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stall = conn.execute("SELECT price, booked_by FROM stalls WHERE id=? AND status='booked'",
+                             (stall_id,)).fetchone()
+        if not stall or (stall['booked_by'] != user_id and not is_admin):
+            conn.rollback()
+            return None
+        record_cancel(conn, stall_id)
+        # ถ้าเป็นการจองล่วงหน้าที่ย้ายลงมาวันนี้ ลบแถวทิ้งด้วย ไม่งั้นจองใหม่ไม่ได้
+        conn.execute("""
+            DELETE FROM advance_bookings WHERE stall_id=? AND day=(SELECT booking_date FROM stalls WHERE id=?)
+        """, (stall_id, stall_id))
+        credits.post(conn, stall['booked_by'], stall['price'], 'refund', ref=f'stall:{stall_id}')
+        conn.execute("""
+            UPDATE stalls
+            SET status='available', shop_name='', phone='', product_category='', booking_date='', booked_by=NULL, payment_ref='', payment_status='pending'
+            WHERE id=?
+        """, (stall_id,))
+        bump_board_version(conn)
+        conn.commit()
+        return stall['price']
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,101 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from flask import current_app
+
+import booking
+
+# --- คิวจองต่อ worker (group commit) สำหรับช่วงคนแห่จองตอน 11:00 ---
+# request ไม่แย่ง write lock กันเอง แต่ส่งคำขอเข้าคิวแล้วรอผลจาก future ของตัวเอง
+# writer thread เดียวดึงคำขอที่ค้างในคิวทั้งหมด (ไม่เกิน batch_size) ไปทำใน transaction เดียว
+# ระหว่างที่ commit ก้อนหนึ่งอยู่ คำขอใหม่จะสะสมรอเป็นก้อนถัดไปเอง ไม่ต้องหน่วงเวลา
+# เปิดใช้ด้วย MARKET_BOOKING_QUEUE=true
+
+
+class BookingBusy(Exception):
+    pass
+
+
+class BookingQueue:
+
+    def __init__(self, pool, batch_size=64, timeout=10.0):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_thread(self):
+        # thread ไม่ตามไปหลัง fork สร้างคิว + writer ใหม่ต่อ worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, name='booking-writer', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, stall_id, user_id, shop_name, phone, category, booking_date,
+               payment_ref='', pay_with_credit=False):
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((future, (stall_id, user_id, shop_name, phone, category, booking_date,
+                                  payment_ref, pay_with_credit)))
+        return future
+
+    def book(self, *args, **kwargs):
+        future = self.submit(*args, **kwargs)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # ยังไม่ถูกหยิบไปทำ -> ยกเลิกได้ ถ้าอยู่ใน transaction แล้วต้องรอผลจริง
+            if future.cancel():
+                raise BookingBusy()
+            return future.result()
+
+    def _take_batch(self):
+        jobs = [self._queue.get()]
+        while len(jobs) < self.batch_size:
+            try:
+                jobs.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return [(future, args) for future, args in jobs if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        conn = self.pool.acquire()
+        while True:
+            jobs = self._take_batch()
+            if not jobs:
+                continue
+            try:
+                results = booking.book_many(conn, [args for _, args in jobs])
+            except Exception as e:
+                for future, _ in jobs:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            for (future, _), result in zip(jobs, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def init_app(app):
+    app.config.setdefault('BOOKING_QUEUE', False)
+    app.config.setdefault('BOOKING_BATCH_SIZE', 64)
+    app.config.setdefault('BOOKING_QUEUE_TIMEOUT', 10.0)
+    if app.config['BOOKING_QUEUE']:
+        app.extensions['booking_queue'] = BookingQueue(app.extensions['db_pool'],
+                                                       batch_size=app.config['BOOKING_BATCH_SIZE'],
+                                                       timeout=app.config['BOOKING_QUEUE_TIMEOUT'])
+
+
+def get_queue():
+    return current_app.extensions.get('booking_queue')
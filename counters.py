@@ -0,0 +1,21 @@
+# --- ตัวเลขสรุปหน้า Admin (เก็บไว้ในตาราง ไม่ต้อง SUM/COUNT ทั้งตารางทุกครั้ง) ---
+# trigger ใน setup_db อัปเดตให้ใน transaction เดียวกับการจอง / ยกเลิก / reset / สมัครสมาชิก
+
+NAMES = ('total_sales', 'total_booked', 'total_users')
+
+
+def get_counters(conn):
+    counters = dict.fromkeys(NAMES, 0)
+    counters.update(conn.execute("SELECT name, value FROM dashboard_counters").fetchall())
+    return counters
+
+
+def rebuild(conn):
+    # คำนวณใหม่จากข้อมูลจริง (ใช้ตอน setup / อัปเกรด DB เก่า)
+    conn.execute("DELETE FROM dashboard_counters")
+    conn.execute("""
+        INSERT INTO dashboard_counters (name, value)
+        SELECT 'total_sales', COALESCE(SUM(price), 0) FROM stalls WHERE status='booked'
+        UNION ALL SELECT 'total_booked', COUNT(*) FROM stalls WHERE status='booked'
+        UNION ALL SELECT 'total_users', COUNT(*) FROM users
+    """)
@@ -0,0 +1,130 @@
+import csv
+import re
+
+# --- สมุดเครดิต (insert อย่างเดียว) + ยอดคงเหลือแบบ snapshot + delta ---
+# ทุกการเปลี่ยนเครดิตคือการเพิ่มแถวใน credit_journal (มี idempotency_key กันกดซ้ำ)
+# trigger ใน setup_db บวก delta เข้า credit_balances ให้ใน transaction เดียวกัน
+# ยอดคงเหลือ = snapshot + delta อ่านได้ O(1) และ compact() จะพับ delta เข้า snapshot วันละครั้ง
+# users.credit เป็นคอลัมน์เก่า ไม่ถูกเขียนแล้ว (ย้ายเป็นรายการ 'opening' ตอนอัปเกรด)
+
+USER_SELECT = """
+    SELECT users.id, users.username, users.password, users.role,
+           COALESCE(b.snapshot + b.delta, 0) AS credit
+    FROM users LEFT JOIN credit_balances b ON b.user_id = users.id
+"""
+
+
+def post(conn, user_id, delta, reason, ref='', idempotency_key=None):
+    # คืน False ถ้า idempotency_key นี้เคยลงไปแล้ว (ไม่ลงซ้ำ)
+    return conn.execute("""
+        INSERT OR IGNORE INTO credit_journal (user_id, delta, reason, ref, idempotency_key)
+        VALUES (?, ?, ?, ?, ?)
+    """, (user_id, delta, reason, ref, idempotency_key)).rowcount == 1
+
+
+def balance(conn, user_id):
+    row = conn.execute("SELECT snapshot + delta FROM credit_balances WHERE user_id=?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_balance(conn, user_id, new_balance, reason='admin_set', ref=''):
+    # ตั้งยอดแบบค่าตายตัว = ลงรายการส่วนต่าง (ต้องอยู่ใน transaction ที่ถือ write lock แล้ว)
+    delta = new_balance - balance(conn, user_id)
+    if delta:
+        post(conn, user_id, delta, reason, ref)
+    return delta
+
+
+# --- ปรับเครดิตทีละหลายคนจากไฟล์ CSV (admin) ---
+# แต่ละแถว: user, ค่า  เช่น "vendor01,-50" / "#15,+100" = บวก/ลบ, "vendor02,500" = ตั้งยอดเป็น 500
+# user คือ username เสมอ ถ้าจะอ้างด้วย id ต้องขึ้นต้นด้วย # (username ที่เป็นตัวเลขล้วนสมัครได้ ห้ามเดาว่าเป็น id)
+# แถวหัวตาราง (ถ้ามี) ข้ามได้ แถวที่ผิดถูกปฏิเสธพร้อมเหตุผล แถวที่ถูกลงในครั้งเดียว
+
+AMOUNT_RE = re.compile(r'^([+-]?)(\d+)$')
+MAX_ADJUSTMENT_ROWS = 10000
+
+
+def parse_adjustments(lines):
+    # คืน (rows, rejected): rows = [(บรรทัด, user, 'set' / 'add', จำนวน)], rejected = [(บรรทัด, เหตุผล)]
+    rows, rejected = [], []
+    for line, record in enumerate(csv.reader(lines), start=1):
+        record = [v.strip() for v in record]
+        if not any(record):
+            continue
+        if len(record) < 2 or not record[0] or any(record[2:]):
+            rejected.append((line, 'ต้องมี 2 คอลัมน์: user, จำนวน'))
+            continue
+        match = AMOUNT_RE.match(record[1].replace(',', ''))
+        if not match:
+            if line == 1:
+                continue  # หัวตาราง
+            rejected.append((line, f'จำนวนไม่ถูกต้อง: {record[1]}'))
+            continue
+        if len(rows) >= MAX_ADJUSTMENT_ROWS:
+            # เช็คก่อนเพิ่ม ทุกแถวที่เกินถูกนับเป็นปฏิเสธ ไม่หายเงียบ
+            rejected.append((line, f'เกิน {MAX_ADJUSTMENT_ROWS} แถว'))
+            continue
+        sign, amount = match.groups()
+        if sign:
+            rows.append((line, record[0], 'add', -int(amount) if sign == '-' else int(amount)))
+        else:
+            rows.append((line, record[0], 'set', int(amount)))
+    return rows, rejected
+
+
+def batch_applied(conn, key_prefix):
+    # ไฟล์นี้ (request_key เดิม) เคยลงไปแล้วหรือยัง ค้นเป็นช่วงบน index ของ idempotency_key
+    return conn.execute("SELECT 1 FROM credit_journal WHERE idempotency_key > ? AND idempotency_key < ? LIMIT 1",
+                        (key_prefix + ':', key_prefix + ';')).fetchone() is not None
+
+
+def apply_adjustments(conn, rows, reason='admin_bulk', ref='', key_prefix=None):
+    # ต้องอยู่ใน transaction ที่ถือ write lock แล้ว (อ่านยอดแล้วคำนวณ delta ได้โดยไม่มีใครแทรก)
+    # คืน (applied, rejected): applied = [(บรรทัด, user_id, username, delta, ยอดใหม่)]
+    refs = {user for _, user, _, _ in rows}
+    ids = [int(u[1:]) for u in refs if u.startswith('#') and u[1:].isdigit()]
+    names = [u for u in refs if not u.startswith('#')]
+    users = {}
+    for column, values in (('users.id', ids), ('username', names)):
+        for i in range(0, len(values), 500):
+            chunk = values[i:i + 500]
+            for r in conn.execute(f"{USER_SELECT} WHERE {column} IN ({','.join('?' * len(chunk))})", chunk):
+                users[f"#{r['id']}" if column == 'users.id' else r['username']] = r
+
+    applied, rejected, seen = [], [], set()
+    for line, user, kind, amount in rows:
+        row = users.get(user)
+        if row is None:
+            rejected.append((line, f'ไม่พบผู้ใช้ {user}'))
+            continue
+        if row['id'] in seen:
+            rejected.append((line, f'ผู้ใช้ {row["username"]} ซ้ำในไฟล์'))
+            continue
+        seen.add(row['id'])
+        delta = amount - row['credit'] if kind == 'set' else amount
+        if row['credit'] + delta < 0:
+            rejected.append((line, f'เครดิตของ {row["username"]} จะติดลบ ({row["credit"]} {delta:+d})'))
+            continue
+        if delta:
+            applied.append((line, row['id'], row['username'], delta, row['credit'] + delta))
+
+    conn.executemany("""
+        INSERT OR IGNORE INTO credit_journal (user_id, delta, reason, ref, idempotency_key) VALUES (?, ?, ?, ?, ?)
+    """, [(user_id, delta, reason, ref, f'{key_prefix}:{line}' if key_prefix else None)
+          for line, user_id, _, delta, _ in applied])
+    return applied, rejected
+
+
+def compact(conn):
+    conn.execute("""
+        UPDATE credit_balances SET snapshot = snapshot + delta, snapshot_id = last_id, delta = 0
+        WHERE delta != 0
+    """)
+
+
+def migrate_legacy(conn):
+    # ยอดใน users.credit เดิม -> รายการ opening (key ซ้ำไม่ได้ จึงรันซ้ำได้)
+    conn.execute("""
+        INSERT OR IGNORE INTO credit_journal (user_id, delta, reason, idempotency_key)
+        SELECT id, credit, 'opening', 'opening:' || id FROM users WHERE credit != 0
+    """)
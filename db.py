@@ -0,0 +1,212 @@
+import atexit
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from queue import LifoQueue, Empty, Full
+
+from flask import g, current_app
+
+# --- ค่า PRAGMA เริ่มต้น (แก้ทับได้ผ่าน app.config['SQLITE_PRAGMAS']) ---
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',      # อ่านพร้อมเขียนได้ ไม่ติด "database is locked" ตอนคนแห่จอง
+    'synchronous': 'NORMAL',    # ปลอดภัยพอสำหรับ WAL และเร็วกว่า FULL มาก
+    'busy_timeout': 5000,       # รอ lock สูงสุด 5 วินาทีก่อนโยน error
+    'temp_store': 'MEMORY',
+    'cache_size': -8000,        # ~8MB ต่อ connection
+}
+
+
+class ConnectionPool:
+    """Pool ของ connection SQLite ต่อ worker (หนึ่ง process ต่อหนึ่ง pool)"""
+
+    def __init__(self, path, size=8, pragmas=None, read_only=False):
+        self.path = path
+        self.size = size
+        self.read_only = read_only
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        if read_only:
+            # เปลี่ยน journal mode / sync ไม่ได้ (และไม่จำเป็น) บน connection อ่านอย่างเดียว
+            self.pragmas.pop('journal_mode', None)
+            self.pragmas.pop('synchronous', None)
+            self.pragmas['query_only'] = 1
+        self._idle = LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.closed = False
+
+    def _connect(self):
+        timeout = self.pragmas.get('busy_timeout', 5000) / 1000
+        if self.read_only:
+            conn = sqlite3.connect(Path(self.path).absolute().as_uri() + '?mode=ro', uri=True,
+                                   timeout=timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _check_fork(self):
+        # gunicorn fork worker หลัง import app ห้ามใช้ connection ข้าม process
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = LifoQueue(maxsize=self.size)
+                    self._pid = os.getpid()
+
+    def acquire(self):
+        self._check_fork()
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            return self._connect()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        # pool ที่ปิดแล้ว (เช่น snapshot รายงานรุ่นเก่า) ปิด connection ที่คืนมาเลย ไม่เก็บกลับเข้าคิว
+        with self._lock:
+            if not self.closed:
+                try:
+                    self._idle.put_nowait(conn)
+                    return
+                except Full:
+                    pass
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        # ใช้นอก request (CLI / background thread)
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        # ปิดตัวที่ว่างอยู่ ตัวที่ยังถูกยืมอยู่จะถูกปิดตอน release
+        with self._lock:
+            self.closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except Empty:
+                    break
+
+
+class ReportSnapshot:
+    """สำเนา DB สำหรับรายงาน (backup API) สร้างใหม่เมื่อเก่ากว่า max_age วินาที"""
+
+    def __init__(self, path, max_age, size=4, pragmas=None, directory=None):
+        self.path = path
+        self.max_age = max_age
+        self.size = size
+        self.pragmas = pragmas
+        self.directory = directory
+        self._pool = None
+        self._file = None
+        self._taken_at = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        fd, target = tempfile.mkstemp(prefix='market-report-', suffix='.db', dir=self.directory)
+        os.close(fd)
+        src = sqlite3.connect(self.path)
+        dst = sqlite3.connect(target)
+        try:
+            # อ่านทีเดียวทั้งไฟล์ใน read transaction เดียว (WAL: ไม่บล็อกคนเขียน)
+            src.backup(dst)
+            # สำเนาไม่มีคนเขียน ไม่ต้องใช้ WAL (ผู้อ่านจะได้ไม่ต้องสร้างไฟล์ -shm)
+            dst.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dst.close()
+            src.close()
+        old_pool, old_file = self._pool, self._file
+        self._pool = ConnectionPool(target, size=self.size, pragmas=self.pragmas, read_only=True)
+        self._file = target
+        self._taken_at = time.monotonic()
+        # connection เดิมที่ยังอ่านอยู่ใช้ไฟล์ที่ลบไปแล้วต่อได้จนคืน pool (ซึ่งปิดแล้ว จึงปิดทิ้งไม่ค้างไว้)
+        # ลบเฉพาะไฟล์ที่ process นี้สร้าง
+        if old_pool is not None and self._pid == os.getpid():
+            old_pool.close_all()
+            os.remove(old_file)
+        self._pid = os.getpid()
+
+    def pool(self):
+        if self._pool is None or self._pid != os.getpid() or time.monotonic() - self._taken_at > self.max_age:
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid() or time.monotonic() - self._taken_at > self.max_age:
+                    self._refresh()
+        return self._pool
+
+    def cleanup(self):
+        if self._file and self._pid == os.getpid() and os.path.exists(self._file):
+            os.remove(self._file)
+
+
+def init_app(app):
+    app.config.setdefault('DATABASE', 'market.db')
+    app.config.setdefault('DB_POOL_SIZE', 8)
+    app.config.setdefault('SQLITE_PRAGMAS', {})
+    # รายงาน admin: 0 = connection read-only บน DB จริง (เห็นข้อมูลล่าสุด), > 0 = อ่านจากสำเนาที่เก่าได้ไม่เกินกี่วินาที
+    app.config.setdefault('REPORT_SNAPSHOT_MAX_AGE', 0)
+    app.config.setdefault('REPORT_SNAPSHOT_DIR', None)
+    app.config.setdefault('REPORT_POOL_SIZE', 4)
+    app.extensions['db_pool'] = ConnectionPool(app.config['DATABASE'],
+                                               size=app.config['DB_POOL_SIZE'],
+                                               pragmas=app.config['SQLITE_PRAGMAS'])
+    if app.config['REPORT_SNAPSHOT_MAX_AGE']:
+        snapshot = ReportSnapshot(app.config['DATABASE'], app.config['REPORT_SNAPSHOT_MAX_AGE'],
+                                  size=app.config['REPORT_POOL_SIZE'], pragmas=app.config['SQLITE_PRAGMAS'],
+                                  directory=app.config['REPORT_SNAPSHOT_DIR'])
+        atexit.register(snapshot.cleanup)
+        app.extensions['report_source'] = snapshot.pool
+    else:
+        report_pool = ConnectionPool(app.config['DATABASE'], size=app.config['REPORT_POOL_SIZE'],
+                                     pragmas=app.config['SQLITE_PRAGMAS'], read_only=True)
+        app.extensions['report_source'] = lambda: report_pool
+    app.teardown_appcontext(close_db)
+
+
+def get_pool(app=None):
+    return (app or current_app).extensions['db_pool']
+
+
+def get_report_pool(app=None):
+    # pool อ่านอย่างเดียวสำหรับ admin / รายงาน / export ไม่แย่ง write lock กับการจอง
+    return (app or current_app).extensions['report_source']()
+
+
+def get_db():
+    # หนึ่ง connection ต่อหนึ่ง request ทุก helper ใช้ตัวเดียวกัน
+    if 'db' not in g:
+        conn = get_pool().acquire()
+        # metrics.init_app ลงทะเบียนตัวห่อจับเวลา query ไว้ (ถ้าเปิด METRICS)
+        instrument = current_app.extensions.get('db_instrument')
+        g.db = instrument(conn) if instrument else conn
+    return g.db
+
+
+def get_report_db():
+    if 'report_db' not in g:
+        g.report_pool = get_report_pool()
+        conn = g.report_pool.acquire()
+        instrument = current_app.extensions.get('db_instrument')
+        g.report_db = instrument(conn) if instrument else conn
+    return g.report_db
+
+
+def close_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(getattr(conn, 'raw', conn))
+    conn = g.pop('report_db', None)
+    if conn is not None:
+        g.pop('report_pool').release(getattr(conn, 'raw', conn))
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import zlib
+
+# --- Export ข้อมูลแบบ stream (ใช้ memory คงที่ไม่ว่าข้อมูลจะใหญ่แค่ไหน) ---
+
+BATCH_SIZE = 500
+
+DATASETS = {
+    'bookings': """
+        SELECT stalls.id, stalls.name, stalls.zone, stalls.price, stalls.shop_name, stalls.phone,
+               stalls.product_category, stalls.booking_date, stalls.payment_ref, stalls.payment_status,
+               stalls.booked_by, users.username
+        FROM stalls
+        LEFT JOIN users ON stalls.booked_by = users.id
+        WHERE stalls.status='booked'
+        ORDER BY zone, name
+    """,
+    # ไม่ export รหัสผ่าน
+    'users': """
+        SELECT users.id, users.username, users.role, COALESCE(b.snapshot + b.delta, 0) AS credit
+        FROM users LEFT JOIN credit_balances b ON b.user_id = users.id ORDER BY users.id
+    """,
+    'reviews': "SELECT id, shop_name, rating, comment, reviewer_name, created_at FROM reviews ORDER BY id",
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def iter_batches(pool, sql):
+    # ใช้ connection ของตัวเอง เพราะ generator ยังทำงานต่อหลัง request context ปิดไปแล้ว
+    with pool.connection() as conn:
+        cursor = conn.execute(sql)
+        columns = [d[0] for d in cursor.description]
+        yield columns
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+
+
+def iter_csv(batches):
+    columns = next(batches)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')  # BOM ให้ Excel อ่านภาษาไทยถูก
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(tuple(r) for r in rows)
+        yield buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def iter_ndjson(batches):
+    columns = next(batches)
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, r)), ensure_ascii=False) + '\n' for r in rows).encode('utf-8')
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 = รูปแบบ gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(pool, dataset, fmt, gzip=False):
+    # คืน generator ของ bytes
+    batches = iter_batches(pool, DATASETS[dataset])
+    chunks = iter_csv(batches) if fmt == 'csv' else iter_ndjson(batches)
+    return gzip_stream(chunks) if gzip else chunks
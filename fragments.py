@@ -0,0 +1,33 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+# --- Cache HTML ส่วนที่ทุกคนเห็นเหมือนกัน (ผังล็อคของโซน / รีวิวล่าสุด) ---
+# key = (ชื่อ fragment, โซน) เก็บคู่ (version, html) ไว้ชุดเดียว version เปลี่ยนเมื่อไหร่ render ใหม่
+# ส่วนที่ขึ้นกับผู้ใช้ (เครดิต / flash / ผลค้นหา) ยัง render สดใน index.html เหมือนเดิม
+
+_fragments = {}                 # (name, key) -> (version, html)
+
+
+def render_cached(name, key, version, render):
+    # version=None = ไม่ cache (เช่น ผลค้นหา)
+    if version is None:
+        return Markup(render())
+    cached = _fragments.get((name, key))
+    if cached and cached[0] == version:
+        return cached[1]
+    html = Markup(render())
+    # render ซ้อนกันได้ไม่เป็นไร ผลเหมือนกัน สลับทั้ง tuple ทีเดียว
+    _fragments[(name, key)] = (version, html)
+    return html
+
+
+def init_app(app):
+    # bytecode ของ template ลงดิสก์ worker ใหม่ของ gunicorn ไม่ต้อง compile ซ้ำ
+    # JINJA_CACHE_DIR ว่าง = ใช้ temp dir ของผู้ใช้ตามค่าเริ่มต้นของ Jinja
+    app.config.setdefault('JINJA_CACHE_DIR', None)
+    if app.config['JINJA_CACHE_DIR']:
+        os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+    app.jinja_options = {**app.jinja_options,
+                         'bytecode_cache': FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])}
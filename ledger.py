@@ -0,0 +1,85 @@
+# --- สมุดบัญชีการจอง (append-only) + สรุปรายวันต่อโซน ---
+# event: 'book' (จอง), 'cancel' (ยกเลิก คืนเงิน), 'reset' (ล็อคที่ยังถูกจองอยู่ตอนปิดวัน)
+# event_date คือวันที่ของการจอง (booking_date) ไม่ใช่เวลาที่บันทึก
+
+
+def record_booking(conn, stall_id, user_id, booking_date):
+    conn.execute("""
+        INSERT INTO booking_ledger (event, stall_id, zone, user_id, amount, event_date)
+        SELECT 'book', id, zone, ?, price, ? FROM stalls WHERE id=?
+    """, (user_id, booking_date, stall_id))
+
+
+def record_cancel(conn, stall_id):
+    # ต้องเรียกก่อน UPDATE stalls (ยังอ่าน booked_by / booking_date เดิมได้)
+    conn.execute("""
+        INSERT INTO booking_ledger (event, stall_id, zone, user_id, amount, event_date)
+        SELECT 'cancel', id, zone, booked_by, price, booking_date FROM stalls WHERE id=?
+    """, (stall_id,))
+
+
+def record_advance(conn, stall_id, user_id, days):
+    # จองล่วงหน้า: 'book' ต่อวัน event_date = วันที่จะมาขายจริง (รายได้ไปลง rollup ของวันนั้น)
+    conn.executemany("""
+        INSERT INTO booking_ledger (event, stall_id, zone, user_id, amount, event_date)
+        SELECT 'book', id, zone, ?, price, ? FROM stalls WHERE id=?
+    """, [(user_id, day, stall_id) for day in days])
+
+
+def record_advance_cancel(conn, stall_id, user_id, amount, day):
+    conn.execute("""
+        INSERT INTO booking_ledger (event, stall_id, zone, user_id, amount, event_date)
+        SELECT 'cancel', id, zone, ?, ?, ? FROM stalls WHERE id=?
+    """, (user_id, amount, day, stall_id))
+
+
+def record_reset(conn, today_str):
+    conn.execute("""
+        INSERT INTO booking_ledger (event, stall_id, zone, user_id, amount, event_date)
+        SELECT 'reset', id, zone, booked_by, price, booking_date FROM stalls
+        WHERE status='booked' AND booking_date != ?
+    """, (today_str,))
+
+
+def rollup_day(conn, day):
+    # สรุปต่อโซน: รายได้สุทธิ (จอง - คืนเงิน), จำนวนจอง/ยกเลิก, ล็อคที่ถูกใช้จริงตอนปิดวัน
+    conn.execute("""
+        INSERT OR REPLACE INTO daily_rollups (day, zone, revenue, bookings, cancellations, occupied, total_stalls)
+        SELECT ?, z.zone,
+               COALESCE(SUM(CASE l.event WHEN 'book' THEN l.amount WHEN 'cancel' THEN -l.amount ELSE 0 END), 0),
+               COUNT(CASE l.event WHEN 'book' THEN 1 END),
+               COUNT(CASE l.event WHEN 'cancel' THEN 1 END),
+               COUNT(CASE l.event WHEN 'reset' THEN 1 END),
+               z.total_stalls
+        FROM (SELECT zone, COUNT(*) AS total_stalls FROM stalls GROUP BY zone) z
+        LEFT JOIN booking_ledger l ON l.zone = z.zone AND l.event_date = ?
+        GROUP BY z.zone
+    """, (day, day))
+
+
+def rollup_closed_days(conn, today_str):
+    # สรุปทุกวันที่ปิดไปแล้วแต่ยังไม่มี rollup (ปกติคือเมื่อวานวันเดียว)
+    days = [r[0] for r in conn.execute("""
+        SELECT DISTINCT event_date FROM booking_ledger
+        WHERE event_date < ? AND event_date > (SELECT COALESCE(MAX(day), '') FROM daily_rollups)
+        ORDER BY event_date
+    """, (today_str,))]
+    for day in days:
+        rollup_day(conn, day)
+    return days
+
+
+def get_report(conn, start, end):
+    return conn.execute("""
+        SELECT day, zone, revenue, bookings, cancellations, occupied, total_stalls,
+               ROUND(100.0 * occupied / MAX(total_stalls, 1), 1) AS occupancy
+        FROM daily_rollups WHERE day BETWEEN ? AND ? ORDER BY day, zone
+    """, (start, end)).fetchall()
+
+
+def get_daily_totals(conn, limit=7):
+    return conn.execute("""
+        SELECT day, SUM(revenue) AS revenue, SUM(bookings) AS bookings, SUM(cancellations) AS cancellations,
+               ROUND(100.0 * SUM(occupied) / MAX(SUM(total_stalls), 1), 1) AS occupancy
+        FROM daily_rollups GROUP BY day ORDER BY day DESC LIMIT ?
+    """, (limit,)).fetchall()
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+# --- Live feed สถานะล็อค (Server-Sent Events) ---
+# trigger ใน setup_db เขียนทุกการเปลี่ยนสถานะลง stall_changes
+# แต่ละ worker มี thread เดียวคอยอ่านแถวใหม่ตาม id แล้วกระจายให้ทุก client ที่ต่ออยู่ใน worker นั้น
+# (ไม่ต้องมี message broker: DB คือตัวกลางระหว่าง worker)
+# SSE ถือ connection (และ sync worker ของ gunicorn) ค้างไว้ตลอด จึงปิดไว้เป็นค่าเริ่มต้น หน้าเว็บใช้ poll + ETag แทน
+# เปิดด้วย MARKET_LIVE_STREAM=true เฉพาะตอนรัน gunicorn แบบ gthread/gevent
+# แต่ละ stream ตัดเองหลัง LIVE_STREAM_MAX_AGE วินาที browser ต่อใหม่ตาม retry: พร้อม Last-Event-ID ไม่พลาด event
+
+POLL_INTERVAL = 1.0
+HEARTBEAT = 15
+BACKLOG = 500
+
+
+def latest_change_id(conn):
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM stall_changes").fetchone()[0]
+
+
+class ChangeFeed:
+
+    def __init__(self, pool, interval=POLL_INTERVAL, backlog=BACKLOG):
+        self.pool = pool
+        self.interval = interval
+        self.events = deque(maxlen=backlog)
+        self.last_id = 0
+        self.cond = threading.Condition()
+        self._pid = None
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self.cond:
+            if self._pid == os.getpid():
+                return
+            with self.pool.connection() as conn:
+                self.last_id = latest_change_id(conn)
+            self.events.clear()
+            threading.Thread(target=self._run, name='stall-change-feed', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _fetch(self, after_id, limit=BACKLOG):
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT * FROM stall_changes WHERE id > ? ORDER BY id LIMIT ?",
+                                (after_id, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                rows = self._fetch(self.last_id)
+            except sqlite3.Error:
+                continue
+            if rows:
+                with self.cond:
+                    self.events.extend(rows)
+                    self.last_id = rows[-1]['id']
+                    self.cond.notify_all()
+
+    def subscribe(self, cursor=None):
+        # yield แต่ละ change (dict) หรือ None เมื่อครบเวลา heartbeat
+        self._ensure_thread()
+        if cursor is None:
+            cursor = self.last_id
+        while True:
+            with self.cond:
+                oldest = self.events[0]['id'] if self.events else self.last_id + 1
+                behind = cursor < min(oldest - 1, self.last_id)
+                pending = [] if behind else [e for e in self.events if e['id'] > cursor]
+                if not behind and not pending:
+                    self.cond.wait(HEARTBEAT)
+                    pending = [e for e in self.events if e['id'] > cursor]
+            if behind:
+                # client หลุดไปนานเกิน buffer อ่านย้อนจาก DB ตรงๆ
+                pending = self._fetch(cursor)
+            if not pending:
+                yield None
+                continue
+            for event in pending:
+                yield event
+            cursor = pending[-1]['id']
+
+
+def init_app(app):
+    app.config.setdefault('LIVE_STREAM', False)
+    app.config.setdefault('LIVE_STREAM_MAX_AGE', 300)
+    app.extensions['stall_feed'] = ChangeFeed(app.extensions['db_pool'])
+
+
+def get_feed():
+    return current_app.extensions['stall_feed']
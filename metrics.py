@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+
+from flask import Response, current_app, g, has_request_context, request, template_rendered, before_render_template
+
+# --- วัดเวลาต่อ request: latency ของ route, เวลา render template, จำนวน/เวลา query แยกตาม statement ---
+# เก็บเป็น histogram ในหน่วยความจำของแต่ละ worker แล้วเปิดให้ Prometheus ดึงที่ /metrics
+# (gunicorn หลาย worker: แต่ละครั้งที่ scrape จะได้ตัวเลขของ worker ที่รับ request นั้น)
+# slow query log: ตั้ง SLOW_QUERY_MS > 0 เพื่อ log query ที่ช้ากว่านั้น (0 = ปิด)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+            for label_values, (counts, total, count) in series:
+                labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+                sep = ',' if labels else ''
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {n}')
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{labels}}} {total}')
+                lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('market_request_seconds', 'Route latency', ('route', 'method', 'status'))
+TEMPLATE_SECONDS = Histogram('market_template_render_seconds', 'render_template time', ('template',))
+QUERY_SECONDS = Histogram('market_sql_query_seconds', 'Time per SQL statement', ('route', 'statement'))
+REQUEST_QUERIES = Histogram('market_sql_queries_per_request', 'SQL statements per request', ('route',),
+                            buckets=COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('market_sql_seconds_per_request', 'Total SQL time per request', ('route',))
+ALL = (REQUEST_SECONDS, TEMPLATE_SECONDS, QUERY_SECONDS, REQUEST_QUERIES, REQUEST_SQL_SECONDS)
+
+
+def statement_key(sql):
+    # SQL ในโค้ดใช้ ? ทั้งหมด ยุบช่องว่างแล้วตัดความยาวก็พอเป็น label ได้ (ไม่บวมตามค่าที่ส่งมา)
+    return re.sub(r'\s+', ' ', sql).strip()[:120]
+
+
+class InstrumentedConnection:
+    """ห่อ sqlite3.Connection ของ request: จับเวลา execute/executemany แล้วรวมไว้ใน g.sql_stats"""
+
+    def __init__(self, conn, slow_query_ms=0):
+        self.raw = conn
+        self.slow_query_ms = slow_query_ms
+
+    def _timed(self, method, sql, params):
+        started = time.perf_counter()
+        try:
+            return method(sql, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            key = statement_key(sql)
+            stats = g.setdefault('sql_stats', {})
+            entry = stats.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            QUERY_SECONDS.observe(elapsed, _route_label(), key)
+            if self.slow_query_ms and elapsed * 1000 >= self.slow_query_ms:
+                where = f'{request.method} {request.path}' if has_request_context() else 'no-request'
+                current_app.logger.warning('slow query %.1fms [%s]: %s', elapsed * 1000, where, key)
+
+    def execute(self, sql, params=()):
+        return self._timed(self.raw.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed(self.raw.executemany, sql, seq_of_params)
+
+    def __getattr__(self, name):
+        # commit / rollback / in_transaction / ... ส่งต่อให้ connection จริง
+        return getattr(self.raw, name)
+
+
+def _route_label():
+    # get_db() ใช้นอก request ได้ (flask shell / script ใต้ app context)
+    if not has_request_context():
+        return 'no-request'
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    g.response_status = response.status_code
+    return response
+
+
+def _teardown_request(exc=None):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    route = _route_label()
+    status = g.pop('response_status', 500)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method, status)
+    stats = g.pop('sql_stats', {})
+    REQUEST_QUERIES.observe(sum(n for n, _ in stats.values()), route)
+    REQUEST_SQL_SECONDS.observe(sum(t for _, t in stats.values()), route)
+
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    stack = g.get('template_started')
+    if stack:
+        TEMPLATE_SECONDS.observe(time.perf_counter() - stack.pop(), template.name or 'string')
+
+
+def render_metrics():
+    return '\n'.join(h.render() for h in ALL) + '\n'
+
+
+def metrics_view():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def instrument(conn):
+    return InstrumentedConnection(conn, current_app.config['SLOW_QUERY_MS'])
+
+
+def init_app(app):
+    app.config.setdefault('METRICS', True)
+    app.config.setdefault('SLOW_QUERY_MS', 0)
+    if not app.config['METRICS']:
+        return
+    app.extensions['db_instrument'] = instrument
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,77 @@
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# --- รหัสผ่านแบบ hash (มี salt, ปรับ work factor ได้) ---
+# hash ช้าโดยตั้งใจ จึงส่งไปคำนวณใน pool ขนาดจำกัด ไม่ให้ช่วงคนแห่ login ตอน 11:00 กิน CPU จน request อื่นค้าง
+# (hashlib ปล่อย GIL ระหว่างคำนวณ thread อื่นจึงยังทำงานได้)
+# แถว users ที่ยังเป็น plaintext จะถูก hash ใหม่อัตโนมัติตอน login ครั้งถัดไป
+
+HASH_PREFIXES = ('pbkdf2:', 'scrypt:')
+
+
+class PasswordBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+
+    def __init__(self, method='pbkdf2:sha256:600000', workers=2, max_pending=32, wait_timeout=5.0):
+        self.method = method
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._dummy_hash = None
+
+    def _get_executor(self):
+        # executor ไม่ตามไปหลัง fork สร้างใหม่ต่อ worker
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password')
+            self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise PasswordBusy()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        # คืน (ถูกต้องไหม, ควร hash ใหม่ไหม)
+        if not stored.startswith(HASH_PREFIXES):
+            ok = hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+            return ok, ok
+        ok = self._run(check_password_hash, stored, password)
+        return ok, ok and not stored.startswith(self.method + '$')
+
+    def verify_missing(self, password):
+        # ไม่มี username นี้: verify กับ hash หลอกด้วย method ปัจจุบัน ให้ใช้เวลาเท่ากับ username ที่มีจริง
+        # (ไม่งั้นเวลาตอบกลับบอกได้ว่า username ไหนมีอยู่)
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(os.urandom(16).hex())
+        self._run(check_password_hash, self._dummy_hash, password)
+        return False, False
+
+
+def init_app(app):
+    app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    app.config.setdefault('PASSWORD_WORKERS', 2)
+    app.config.setdefault('PASSWORD_MAX_PENDING', 32)
+    app.extensions['password_hasher'] = PasswordHasher(app.config['PASSWORD_HASH_METHOD'],
+                                                       workers=app.config['PASSWORD_WORKERS'],
+                                                       max_pending=app.config['PASSWORD_MAX_PENDING'])
+
+
+def get_hasher():
+    return current_app.extensions['password_hasher']
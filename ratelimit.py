@@ -0,0 +1,111 @@
+import os
+import random
+import time
+
+from flask import current_app, request, session
+
+from db import ConnectionPool
+
+# --- จำกัดอัตรา request (token bucket ต่อ IP และต่อผู้ใช้) ---
+# ถังเก็บใน SQLite ไฟล์เล็กแยกจาก market.db ทุก worker ของ gunicorn เห็นถังเดียวกัน
+# และไม่แย่ง write lock กับการจองจริง เช็คใน before_request ก่อนแตะ DB หลัก เกินแล้วตอบ 429 ทันที
+# กำหนดต่อ route ได้ด้วย MARKET_RATELIMITS='{"login": {"ip": "20/60", "user": "5/60"}}'
+# รูปแบบ "N/S" = ใช้ได้ N ครั้งติดกัน แล้วเติมคืน N ครั้งต่อ S วินาที
+# หมายเหตุ: อยู่หลัง reverse proxy ต้องให้ request.remote_addr เป็น IP จริง (เช่น ใช้ ProxyFix)
+
+DEFAULT_LIMITS = {
+    # user = (username, IP) ที่พยายาม login กันเดารหัส แต่คนอื่นต่าง IP ยิงรหัสผิดใส่ username เราจนโดนล็อคไม่ได้
+    # IP ให้เท่า book_stall เพราะร้านค้าทั้งตลาด login ผ่าน wifi เดียวกันช่วงก่อน 11:00
+    'login': {'ip': '120/10', 'user': '5/60'},
+    'register': {'ip': '5/600'},
+    'add_review': {'ip': '10/60', 'user': '5/60'},
+    'book_stall': {'ip': '120/10', 'user': '10/10'},  # คนในตลาดใช้ wifi เดียวกัน IP เลยให้เยอะกว่า
+    'advance_book': {'ip': '120/10', 'user': '10/10'},
+}
+IDLE_SECONDS = 3600
+
+TAKE_TOKEN = """
+    INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :capacity - 1, :now, 1)
+    ON CONFLICT(key) DO UPDATE SET
+        allowed = MIN(:capacity, tokens + (:now - updated) * :rate) >= 1,
+        tokens = MIN(:capacity, tokens + (:now - updated) * :rate)
+                 - (MIN(:capacity, tokens + (:now - updated) * :rate) >= 1),
+        updated = :now
+    RETURNING allowed, tokens
+"""
+
+
+def parse_limit(spec):
+    count, seconds = spec.split('/')
+    return float(count), float(count) / float(seconds)
+
+
+class RateLimiter:
+
+    def __init__(self, path, limits):
+        self.limits = {endpoint: {scope: parse_limit(spec) for scope, spec in scopes.items()}
+                       for endpoint, scopes in limits.items()}
+        # เสีย state ตอนเครื่องดับก็แค่ถังเต็มใหม่ ไม่ต้อง fsync
+        self.pool = ConnectionPool(path, size=4, pragmas={'synchronous': 'OFF'})
+        with self.pool.connection() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                allowed INTEGER NOT NULL DEFAULT 1
+            ) WITHOUT ROWID""")
+            conn.commit()
+
+    def take(self, key, capacity, rate):
+        # คืน 0 ถ้าผ่าน ไม่งั้นคืนจำนวนวินาทีที่ต้องรอ
+        now = time.time()
+        with self.pool.connection() as conn:
+            allowed, tokens = conn.execute(TAKE_TOKEN, {'key': key, 'capacity': capacity, 'rate': rate,
+                                                        'now': now}).fetchone()
+            if random.random() < 0.001:
+                # ถังที่ไม่มีใครใช้นานๆ เต็มแล้วแน่นอน ลบทิ้งได้
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_SECONDS,))
+            conn.commit()
+        return 0 if allowed else (1 - tokens) / rate
+
+    def check(self, endpoint, ip, user):
+        scopes = self.limits.get(endpoint)
+        if not scopes:
+            return 0
+        for scope, identity in (('ip', ip), ('user', user)):
+            if scope in scopes and identity:
+                wait = self.take(f'{endpoint}:{scope}:{identity}', *scopes[scope])
+                if wait:
+                    return wait
+        return 0
+
+
+def _current_user():
+    if request.endpoint == 'login':
+        return f"{request.form.get('username', '').strip().lower()}@{request.remote_addr}"
+    return session.get('user_id')
+
+
+def _before_request():
+    if request.method != 'POST':
+        return None
+    wait = current_app.extensions['rate_limiter'].check(request.endpoint, request.remote_addr, _current_user())
+    if wait:
+        seconds = max(1, int(wait + 0.999))
+        return (f'ส่งคำขอถี่เกินไป กรุณาลองใหม่ในอีก {seconds} วินาที', 429,
+                {'Retry-After': str(seconds), 'Content-Type': 'text/plain; charset=utf-8'})
+    return None
+
+
+def init_app(app):
+    app.config.setdefault('RATELIMIT_ENABLED', True)
+    app.config.setdefault('RATELIMIT_DATABASE',
+                          os.path.join(os.path.dirname(os.path.abspath(app.config['DATABASE'])), 'ratelimit.db'))
+    app.config.setdefault('RATELIMITS', {})
+    if not app.config['RATELIMIT_ENABLED']:
+        return
+    limits = {endpoint: dict(scopes) for endpoint, scopes in DEFAULT_LIMITS.items()}
+    for endpoint, scopes in app.config['RATELIMITS'].items():
+        limits.setdefault(endpoint, {}).update(scopes)
+    app.extensions['rate_limiter'] = RateLimiter(app.config['RATELIMIT_DATABASE'], limits)
+    app.before_request(_before_request)
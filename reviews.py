@@ -0,0 +1,102 @@
+import re
+import unicodedata
+
+# --- รีวิว: ค่าสรุปแบบสะสม (ไม่ต้อง AVG ทั้งตาราง) + แบ่งหน้าแบบ keyset (id < ?) ---
+# คะแนนรายร้านเก็บใน shop_ratings (key = ชื่อร้านที่ normalize แล้ว) อัปเดตทีละรีวิว
+# มี index ตาม avg_rating ไว้อ่านร้านคะแนนสูงสุดโดยไม่ต้อง GROUP BY / sort ทั้งตาราง
+
+PAGE_SIZE = 20
+TOP_SHOPS = 5
+TOP_MIN_REVIEWS = 3             # ร้านที่รีวิวน้อยกว่านี้ยังไม่ขึ้นอันดับ (รีวิวเดียว 5 ดาวไม่ควรชนะ)
+
+
+def shop_key(name):
+    # "ร้านป้าไก่ ", "ร้านป้าไก่", "Gadget  Store!" / "gadget store" ให้เป็นร้านเดียวกัน
+    name = unicodedata.normalize('NFKC', name or '').casefold()
+    name = ''.join(ch for ch in name if not unicodedata.category(ch).startswith('P'))
+    return re.sub(r'\s+', ' ', name).strip()
+
+
+def add_review(conn, shop_name, rating, comment, reviewer_name):
+    # insert รีวิว + อัปเดตยอดรวม/ยอดรายร้าน ใน transaction เดียว
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT INTO reviews (shop_name, rating, comment, reviewer_name) VALUES (?, ?, ?, ?)",
+                     (shop_name, rating, comment, reviewer_name))
+        conn.execute("""
+            UPDATE review_totals SET review_count = review_count + 1, rating_sum = rating_sum + ?
+            WHERE id = 1
+        """, (rating,))
+        conn.execute("""
+            INSERT INTO shop_ratings (shop_key, shop_name, review_count, rating_sum, avg_rating) VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(shop_key) DO UPDATE SET review_count = review_count + 1,
+                rating_sum = rating_sum + excluded.rating_sum,
+                avg_rating = (rating_sum + excluded.rating_sum) * 1.0 / (review_count + 1)
+        """, (shop_key(shop_name), shop_name, rating, rating))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def rebuild_stats(conn):
+    # คำนวณใหม่จากตาราง reviews (ใช้ตอน setup / อัปเกรด DB เก่า)
+    conn.execute("DELETE FROM review_totals")
+    conn.execute("""
+        INSERT INTO review_totals (id, review_count, rating_sum)
+        SELECT 1, COUNT(*), COALESCE(SUM(rating), 0) FROM reviews
+    """)
+    # normalize ชื่อร้านใน Python แล้วรวมยอด (ชื่อที่แสดงใช้ชื่อจากรีวิวแรกของร้าน)
+    shops = {}
+    for name, rating in conn.execute("SELECT shop_name, rating FROM reviews ORDER BY id"):
+        entry = shops.setdefault(shop_key(name), [name, 0, 0])
+        entry[1] += 1
+        entry[2] += rating
+    conn.execute("DELETE FROM shop_ratings")
+    conn.executemany("""
+        INSERT INTO shop_ratings (shop_key, shop_name, review_count, rating_sum, avg_rating) VALUES (?, ?, ?, ?, ?)
+    """, [(key, name, count, total, total / count) for key, (name, count, total) in shops.items()])
+
+
+def get_summary(conn):
+    # (จำนวนรีวิว, ค่าเฉลี่ย) จำนวนรีวิวเพิ่มทุกครั้งที่มีรีวิวใหม่ ใช้เป็น version ของ fragment cache ได้
+    row = conn.execute("SELECT review_count, rating_sum FROM review_totals WHERE id = 1").fetchone()
+    if not row or not row[0]:
+        return 0, 0.0
+    return row[0], round(row[1] / row[0], 1)
+
+
+def get_page(conn, before_id=None, limit=PAGE_SIZE):
+    # รีวิวใหม่สุดก่อน ถ้ามี before_id จะดึงเฉพาะที่เก่ากว่านั้น (ใช้ PK ตรงๆ ไม่ต้อง OFFSET)
+    if before_id:
+        return conn.execute("SELECT * FROM reviews WHERE id < ? ORDER BY id DESC LIMIT ?",
+                            (before_id, limit)).fetchall()
+    return conn.execute("SELECT * FROM reviews ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+
+def get_shop_ratings(conn, shop_names):
+    # {ชื่อร้านตามที่เขียนบนล็อค: (ค่าเฉลี่ย, จำนวนรีวิว)} สำหรับการ์ดในผังล็อค
+    keys = {}
+    for name in shop_names:
+        if name:
+            keys.setdefault(shop_key(name), []).append(name)
+    ratings = {}
+    key_list = list(keys)
+    for i in range(0, len(key_list), 500):
+        chunk = key_list[i:i + 500]
+        for key, avg, count in conn.execute(
+                f"SELECT shop_key, avg_rating, review_count FROM shop_ratings WHERE shop_key IN ({','.join('?' * len(chunk))})",
+                chunk):
+            for name in keys[key]:
+                ratings[name] = (round(avg, 1), count)
+    return ratings
+
+
+def get_top_shops(conn, limit=TOP_SHOPS):
+    # เดินตาม partial index (avg_rating DESC, review_count DESC) WHERE review_count >= TOP_MIN_REVIEWS
+    # หยุดเมื่อครบ limit ไม่ต้อง sort ทั้งตาราง (เงื่อนไขต้องเป็นค่าคงที่ตรงกับ index planner ถึงเลือกใช้)
+    # ห้ามตั้ง alias ค่าที่ปัดแล้วเป็น avg_rating ไม่งั้น ORDER BY จะเรียงตาม alias แทนคอลัมน์แล้วใช้ index ไม่ได้
+    return conn.execute(f"""
+        SELECT shop_name, review_count, ROUND(avg_rating, 1) AS avg_display FROM shop_ratings
+        WHERE review_count >= {TOP_MIN_REVIEWS} ORDER BY avg_rating DESC, review_count DESC LIMIT ?
+    """, (limit,)).fetchall()
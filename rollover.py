@@ -0,0 +1,127 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import advance
+import credits
+from board_cache import bump_board_version
+from ledger import record_reset, rollup_closed_days
+
+# --- Reset ล็อครายวัน (ทำวันละครั้ง ไม่ทำบนทุก request) ---
+
+_last_reset_day = None          # วันที่ worker นี้รู้ว่า reset แล้ว (เช็คใน memory)
+_lock = threading.Lock()
+_scheduler_pid = None           # worker (pid) ที่มี thread reset รายวันแล้ว
+
+
+def get_now_thai():
+    # แปลงเวลา Server (UTC) เป็นเวลาไทย (UTC+7)
+    return datetime.utcnow() + timedelta(hours=7)
+
+
+def thai_today():
+    return get_now_thai().strftime('%Y-%m-%d')
+
+
+def get_last_reset_day(conn):
+    row = conn.execute("SELECT value FROM app_state WHERE key='last_reset_day'").fetchone()
+    return row[0] if row else None
+
+
+def reset_stalls(conn, today_str):
+    # คืน True ถ้า connection นี้เป็นคน reset (worker อื่นทำไปแล้วจะได้ False)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # reset ได้แต่เดินหน้า วันที่เก่ากว่าที่ reset ไปแล้วจะปล่อยล็อคที่จองของวันนี้ทิ้งโดยไม่คืนเงิน
+        last_reset_day = get_last_reset_day(conn)
+        if last_reset_day and last_reset_day >= today_str:
+            conn.rollback()
+            return False
+        # Reset ล็อคของวันเก่า (ไม่คืนเงินเครดิต) บันทึกลง ledger ก่อนล้าง
+        record_reset(conn, today_str)
+        released = conn.execute("""
+            UPDATE stalls
+            SET status='available', shop_name='', phone='', product_category='',
+                booked_by=NULL, booking_date='', payment_ref='', payment_status='pending'
+            WHERE status='booked' AND booking_date != ?
+        """, (today_str,)).rowcount
+        if released:
+            bump_board_version(conn)
+        # เลื่อนหน้าต่างปฏิทินจองล่วงหน้า + ย้ายการจองของวันนี้ลงผังล็อค
+        advance.advance_window(conn, today_str)
+        rollup_closed_days(conn, today_str)
+        credits.compact(conn)
+        # log สำหรับ SSE เก็บแค่ของเมื่อวาน-วันนี้พอ
+        conn.execute("DELETE FROM stall_changes WHERE changed_at < datetime('now', '-1 day')")
+        conn.execute("INSERT OR REPLACE INTO app_state (key, value) VALUES ('last_reset_day', ?)", (today_str,))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def run_rollover(pool, today_str=None):
+    global _last_reset_day
+    today_str = today_str or thai_today()
+    with _lock:
+        with pool.connection() as conn:
+            # อ่านก่อน ถ้า worker อื่น reset ไปแล้วจะไม่ต้องแย่ง write lock
+            did_reset = (get_last_reset_day(conn) or '') < today_str and reset_stalls(conn, today_str)
+        _last_reset_day = today_str
+    return did_reset
+
+
+def ensure_today(pool):
+    # เรียกจาก route: ปกติเป็นแค่การเทียบวันที่ใน memory
+    _ensure_scheduler(pool)
+    if _last_reset_day != thai_today():
+        run_rollover(pool)
+
+
+def _seconds_until_midnight():
+    now = get_now_thai()
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=1, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+def _scheduler_loop(pool):
+    while True:
+        time.sleep(_seconds_until_midnight())
+        try:
+            run_rollover(pool)
+        except sqlite3.Error as e:
+            print(f">>> Daily reset failed: {e}")
+
+
+def _ensure_scheduler(pool):
+    # หนึ่ง thread ต่อ worker (เช็ค pid เพราะ thread ไม่ตามไปหลัง fork)
+    global _scheduler_pid
+    if _scheduler_pid == os.getpid():
+        return
+    with _lock:
+        if _scheduler_pid == os.getpid():
+            return
+        threading.Thread(target=_scheduler_loop, args=(pool,), name='daily-rollover', daemon=True).start()
+        _scheduler_pid = os.getpid()
+
+
+if __name__ == '__main__':
+    # ใช้กับ cron ได้: python rollover.py --db market.db
+    from db import ConnectionPool
+
+    parser = argparse.ArgumentParser(description='Reset ล็อคที่จองของวันก่อนหน้า')
+    parser.add_argument('--db', default='market.db')
+    parser.add_argument('--date', help='วันที่ (YYYY-MM-DD) ค่าเริ่มต้นคือวันนี้ตามเวลาไทย')
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db, size=1)
+    day = args.date or thai_today()
+    if run_rollover(pool, day):
+        print(f">>> Reset stalls for {day}")
+    else:
+        print(f">>> Already reset for {day} or a later day")
+    pool.close_all()
@@ -0,0 +1,56 @@
+# --- ค้นหาชื่อร้าน/ประเภทสินค้า/รีวิว ด้วย FTS5 (trigram รองรับภาษาไทยที่ไม่มีช่องว่างคั่นคำ) ---
+# rowid ใน search_index: ล็อค = id*2, รีวิว = id*2+1 (trigger ใน setup_db คอย sync ให้)
+
+LIMIT = 50
+
+
+def _match_query(q):
+    # ครอบเป็น phrase เดียว = หา substring ตรงตัว (trigram ต้องยาว >= 3 ตัวอักษร)
+    return '"' + q.replace('"', '""') + '"'
+
+
+def find(conn, q, limit=LIMIT):
+    q = q.strip()
+    if not q:
+        return []
+    if len(q) >= 3:
+        return conn.execute("""
+            SELECT kind, ref_id FROM search_index WHERE search_index MATCH ?
+            ORDER BY bm25(search_index, 0, 0, 10.0, 2.0, 1.0) LIMIT ?
+        """, (_match_query(q), limit)).fetchall()
+    # คำสั้นกว่า 3 ตัว (คำไทยหลายคำยาว 2 ตัว เช่น "ยำ") trigram ใช้ไม่ได้ ต้อง LIKE สแกน
+    # หาเฉพาะชื่อร้าน/ประเภทบนตาราง stalls ไม่สแกนรีวิวทั้งหมด (search_index มีทุกรีวิว ใหญ่กว่า stalls มาก)
+    like = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return conn.execute("""
+        SELECT 'stall' AS kind, id AS ref_id FROM stalls
+        WHERE shop_name != '' AND (shop_name LIKE ? ESCAPE '\\' OR product_category LIKE ? ESCAPE '\\')
+        ORDER BY id LIMIT ?
+    """, (like, like, limit)).fetchall()
+
+
+def _fetch_ranked(conn, table, ids):
+    if not ids:
+        return []
+    rows = conn.execute(f"SELECT * FROM {table} WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+    by_id = {r['id']: r for r in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def search(conn, q, limit=LIMIT):
+    # คืน (ล็อค, รีวิว) เรียงตามความเกี่ยวข้อง
+    hits = find(conn, q, limit)
+    stall_ids = [h['ref_id'] for h in hits if h['kind'] == 'stall']
+    review_ids = [h['ref_id'] for h in hits if h['kind'] == 'review']
+    return _fetch_ranked(conn, 'stalls', stall_ids), _fetch_ranked(conn, 'reviews', review_ids)
+
+
+def rebuild_index(conn):
+    conn.execute("DELETE FROM search_index")
+    conn.execute("""
+        INSERT INTO search_index (rowid, kind, ref_id, shop_name, category, body)
+        SELECT id * 2, 'stall', id, shop_name, product_category, '' FROM stalls WHERE shop_name != ''
+    """)
+    conn.execute("""
+        INSERT INTO search_index (rowid, kind, ref_id, shop_name, category, body)
+        SELECT id * 2 + 1, 'review', id, shop_name, '', COALESCE(comment, '') FROM reviews
+    """)
@@ -1,11 +1,35 @@
+import argparse
+import os
 import sqlite3
 import random
-from datetime import datetime
+from datetime import datetime, timedelta
 
-def create_db():
-    conn = sqlite3.connect('market.db')
-    c = conn.cursor()
+from werkzeug.security import generate_password_hash
+
+from board_cache import bump_board_version
+from counters import rebuild as rebuild_counters
+from credits import migrate_legacy as migrate_legacy_credit
+from ledger import rollup_closed_days
+from reviews import TOP_MIN_REVIEWS, rebuild_stats as rebuild_review_stats
+from rollover import thai_today
+from search import rebuild_index as rebuild_search_index
+
+FAKE_SHOPS = ['ร้านป้าไก่', 'ข้าวมันไก่นาย ก.', 'เสื้อผ้าแฟชั่น', 'Gadget Store', 'เคสมือถือซิ่ง', 'หมูปิ้งนมสด', 'ยำแซ่บเวอร์', 'กางเกงยีนส์', 'น้ำปั่นผลไม้', 'ลูกชิ้นทอด']
+
+# แก้ชื่อโซนให้ถูกต้อง
+ZONES = [
+    ('Food Court', 'A', 300),
+    ('Fashion Street', 'B', 300),
+    ('IT Zone', 'C', 500)
+]
+
+CAT_MAP = {'Food Court': 'อาหาร', 'Fashion Street': 'เสื้อผ้า', 'IT Zone': 'ของใช้'}
 
+STALL_INSERT = """INSERT INTO stalls
+    (name, zone, price, status, shop_name, phone, product_category, booking_date, booked_by, payment_ref, payment_status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+def create_tables(c):
     # Users
     c.execute('''CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -41,51 +65,229 @@ def create_db():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )''')
 
+    # Indexes: โหลดตามโซน, reset รายวัน (status, booking_date), JOIN ผู้จอง, รีวิวรายร้าน
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stalls_zone ON stalls(zone)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stalls_status_date ON stalls(status, booking_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stalls_booked_by ON stalls(booked_by)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reviews_shop_name ON reviews(shop_name)")
+
+    # ค่าสรุปรีวิว (อัปเดตทุกครั้งที่มีรีวิวใหม่)
+    c.execute('''CREATE TABLE IF NOT EXISTS review_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        review_count INTEGER NOT NULL DEFAULT 0,
+        rating_sum INTEGER NOT NULL DEFAULT 0
+    )''')
+    # คะแนนรายร้าน key = ชื่อร้านที่ normalize แล้ว (reviews.shop_key) avg_rating มี index ไว้ดึงอันดับ
+    c.execute('''CREATE TABLE IF NOT EXISTS shop_ratings (
+        shop_key TEXT PRIMARY KEY,
+        shop_name TEXT NOT NULL,
+        review_count INTEGER NOT NULL DEFAULT 0,
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        avg_rating REAL NOT NULL DEFAULT 0
+    )''')
+    # partial: ร้านที่รีวิวยังไม่ถึงเกณฑ์ (ส่วนใหญ่รีวิวเดียว) ไม่อยู่ใน index อันดับเลย
+    c.execute(f"""CREATE INDEX IF NOT EXISTS idx_shop_ratings_top ON shop_ratings(avg_rating DESC, review_count DESC)
+                  WHERE review_count >= {TOP_MIN_REVIEWS}""")
+
+    # Full-text search (trigram หา substring ภาษาไทยได้) ล็อค rowid = id*2, รีวิว rowid = id*2+1
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, ref_id UNINDEXED, shop_name, category, body,
+        tokenize='trigram'
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_search_ai AFTER INSERT ON stalls WHEN new.shop_name != '' BEGIN
+        INSERT INTO search_index (rowid, kind, ref_id, shop_name, category, body)
+        VALUES (new.id * 2, 'stall', new.id, new.shop_name, new.product_category, '');
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_search_au AFTER UPDATE OF shop_name, product_category ON stalls BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+        INSERT INTO search_index (rowid, kind, ref_id, shop_name, category, body)
+        SELECT new.id * 2, 'stall', new.id, new.shop_name, new.product_category, '' WHERE new.shop_name != '';
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_search_ad AFTER DELETE ON stalls BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS reviews_search_ai AFTER INSERT ON reviews BEGIN
+        INSERT INTO search_index (rowid, kind, ref_id, shop_name, category, body)
+        VALUES (new.id * 2 + 1, 'review', new.id, new.shop_name, '', COALESCE(new.comment, ''));
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS reviews_search_ad AFTER DELETE ON reviews BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END''')
+
+    # Log การเปลี่ยนสถานะล็อค (ให้ทุก worker อ่านตาม id แล้วส่ง SSE ไปหน้าเว็บ)
+    c.execute('''CREATE TABLE IF NOT EXISTS stall_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stall_id INTEGER NOT NULL,
+        name TEXT,
+        zone TEXT,
+        price INTEGER,
+        status TEXT,
+        shop_name TEXT,
+        booked_by INTEGER,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_changes_au AFTER UPDATE OF status, shop_name ON stalls
+        WHEN old.status IS NOT new.status OR old.shop_name IS NOT new.shop_name BEGIN
+        INSERT INTO stall_changes (stall_id, name, zone, price, status, shop_name, booked_by)
+        VALUES (new.id, new.name, new.zone, new.price, new.status, new.shop_name, new.booked_by);
+    END''')
+
+    # ตัวเลขสรุปหน้า Admin (ยอดขาย / ล็อคที่จอง / จำนวนสมาชิก)
+    c.execute('''CREATE TABLE IF NOT EXISTS dashboard_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_counters_booked AFTER UPDATE OF status ON stalls
+        WHEN old.status != 'booked' AND new.status = 'booked' BEGIN
+        UPDATE dashboard_counters SET value = value + new.price WHERE name = 'total_sales';
+        UPDATE dashboard_counters SET value = value + 1 WHERE name = 'total_booked';
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_counters_released AFTER UPDATE OF status ON stalls
+        WHEN old.status = 'booked' AND new.status != 'booked' BEGIN
+        UPDATE dashboard_counters SET value = value - old.price WHERE name = 'total_sales';
+        UPDATE dashboard_counters SET value = value - 1 WHERE name = 'total_booked';
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_counters_ai AFTER INSERT ON stalls WHEN new.status = 'booked' BEGIN
+        UPDATE dashboard_counters SET value = value + new.price WHERE name = 'total_sales';
+        UPDATE dashboard_counters SET value = value + 1 WHERE name = 'total_booked';
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS stalls_counters_ad AFTER DELETE ON stalls WHEN old.status = 'booked' BEGIN
+        UPDATE dashboard_counters SET value = value - old.price WHERE name = 'total_sales';
+        UPDATE dashboard_counters SET value = value - 1 WHERE name = 'total_booked';
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS users_counters_ai AFTER INSERT ON users BEGIN
+        UPDATE dashboard_counters SET value = value + 1 WHERE name = 'total_users';
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS users_counters_ad AFTER DELETE ON users BEGIN
+        UPDATE dashboard_counters SET value = value - 1 WHERE name = 'total_users';
+    END''')
+
+    # สมุดบัญชีการจอง (append-only) และสรุปรายวันต่อโซน
+    c.execute('''CREATE TABLE IF NOT EXISTS booking_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event TEXT NOT NULL,
+        stall_id INTEGER NOT NULL,
+        zone TEXT NOT NULL,
+        user_id INTEGER,
+        amount INTEGER NOT NULL DEFAULT 0,
+        event_date TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ledger_event_date ON booking_ledger(event_date, zone)")
+    c.execute('''CREATE TABLE IF NOT EXISTS daily_rollups (
+        day TEXT NOT NULL,
+        zone TEXT NOT NULL,
+        revenue INTEGER NOT NULL DEFAULT 0,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        cancellations INTEGER NOT NULL DEFAULT 0,
+        occupied INTEGER NOT NULL DEFAULT 0,
+        total_stalls INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, zone)
+    )''')
+
+    # สมุดเครดิต (insert อย่างเดียว) + ยอดคงเหลือ snapshot + delta
+    c.execute('''CREATE TABLE IF NOT EXISTS credit_journal (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        delta INTEGER NOT NULL,
+        reason TEXT NOT NULL,
+        ref TEXT DEFAULT '',
+        idempotency_key TEXT UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_credit_journal_user ON credit_journal(user_id, id)")
+    c.execute('''CREATE TABLE IF NOT EXISTS credit_balances (
+        user_id INTEGER PRIMARY KEY,
+        snapshot INTEGER NOT NULL DEFAULT 0,
+        snapshot_id INTEGER NOT NULL DEFAULT 0,
+        delta INTEGER NOT NULL DEFAULT 0,
+        last_id INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS credit_journal_ai AFTER INSERT ON credit_journal BEGIN
+        INSERT INTO credit_balances (user_id, delta, last_id) VALUES (new.user_id, new.delta, new.id)
+        ON CONFLICT(user_id) DO UPDATE SET delta = delta + excluded.delta, last_id = excluded.last_id;
+    END''')
+
+    # version ต่อ user สำหรับ cache ข้อมูลผู้ใช้ (user_cache.py)
+    # เครดิตเปลี่ยน (เติมเงิน / จอง / คืนเงิน / admin แก้) หรือแถว users เปลี่ยน -> +1 ใน transaction เดียวกัน
+    c.execute('''CREATE TABLE IF NOT EXISTS user_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS credit_journal_user_version AFTER INSERT ON credit_journal BEGIN
+        INSERT INTO user_versions (user_id, version) VALUES (new.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS users_user_version AFTER UPDATE ON users BEGIN
+        INSERT INTO user_versions (user_id, version) VALUES (new.id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+    END''')
+
+    # จองล่วงหน้า (advance.py): bitmap ต่อล็อค bit i = วัน calendar_start + i (ไม่มีแถว = ว่างทุกวัน)
+    c.execute('''CREATE TABLE IF NOT EXISTS stall_calendar (
+        stall_id INTEGER PRIMARY KEY,
+        bits INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS advance_bookings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stall_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        shop_name TEXT NOT NULL,
+        phone TEXT DEFAULT '',
+        product_category TEXT DEFAULT '',
+        payment_ref TEXT DEFAULT '',
+        amount INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (stall_id, day)
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_advance_bookings_user ON advance_bookings(user_id, day)")
+
+    # สถานะระบบ (key/value) เช่น วันที่ reset ล่าสุด
+    c.execute('''CREATE TABLE IF NOT EXISTS app_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )''')
+
+def upgrade_db(path='market.db'):
+    # อัปเกรด market.db เก่าให้มีตาราง/คอลัมน์ใหม่ครบ (รันซ้ำได้)
+    conn = sqlite3.connect(path)
+    create_tables(conn.cursor())
+    if not conn.execute("SELECT 1 FROM review_totals").fetchone():
+        rebuild_review_stats(conn)
+    if not conn.execute("SELECT 1 FROM search_index LIMIT 1").fetchone():
+        rebuild_search_index(conn)
+    if not conn.execute("SELECT 1 FROM dashboard_counters").fetchone():
+        rebuild_counters(conn)
+    migrate_legacy_credit(conn)
+    conn.commit()
+    conn.close()
+
+def create_db(path='market.db'):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    create_tables(c)
+
     # Seed Data
     c.execute("INSERT OR IGNORE INTO users (username, password, role, credit) VALUES ('admin', '1234', 'admin', 0)")
     c.execute("INSERT OR IGNORE INTO users (username, password, role, credit) VALUES ('user', '1234', 'user', 5000)")
 
-    fake_shops = ['ร้านป้าไก่', 'ข้าวมันไก่นาย ก.', 'เสื้อผ้าแฟชั่น', 'Gadget Store', 'เคสมือถือซิ่ง', 'หมูปิ้งนมสด', 'ยำแซ่บเวอร์', 'กางเกงยีนส์', 'น้ำปั่นผลไม้', 'ลูกชิ้นทอด']
-    
-    # แก้ชื่อโซนให้ถูกต้อง
-    zones = [
-        ('Food Court', 'A', 300),
-        ('Fashion Street', 'B', 300),
-        ('IT Zone', 'C', 500) 
-    ]
-    
-    cat_map = {'Food Court': 'อาหาร', 'Fashion Street': 'เสื้อผ้า', 'IT Zone': 'ของใช้'}
-
     c.execute("DELETE FROM stalls")
     c.execute("DELETE FROM reviews")
 
     today_str = datetime.now().strftime('%Y-%m-%d')
 
-    for zone_name, prefix, price in zones:
+    rows = []
+    for zone_name, prefix, price in ZONES:
         for i in range(1, 13):
             stall_name = f"{prefix}{i:02d}"
             # สุ่มจอง 60%
-            is_booked = random.choice([True, False, True, False, True]) 
-            
-            if is_booked:
-                shop = random.choice(fake_shops)
-                status = 'booked'
-                booked_by = 2 # User ID 2
-                payment_ref = f"SLIP-{random.randint(1000,9999)}"
-                payment_status = 'paid'
-                cat = cat_map[zone_name]
+            if random.choice([True, False, True, False, True]):
+                rows.append((stall_name, zone_name, price, 'booked', random.choice(FAKE_SHOPS), '081-234-5678',
+                             CAT_MAP[zone_name], today_str, 2, f"SLIP-{random.randint(1000,9999)}", 'paid'))  # User ID 2
             else:
-                shop = ''
-                status = 'available'
-                booked_by = None
-                payment_ref = ''
-                payment_status = 'pending'
-                cat = ''
-
-            c.execute(f"""INSERT INTO stalls 
-                      (name, zone, price, status, shop_name, phone, product_category, booking_date, booked_by, payment_ref, payment_status) 
-                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-                      (stall_name, zone_name, price, status, shop, '081-234-5678', cat, today_str, booked_by, payment_ref, payment_status))
+                rows.append((stall_name, zone_name, price, 'available', '', '081-234-5678', '', today_str, None, '', 'pending'))
+    c.executemany(STALL_INSERT, rows)
 
     # Seed Reviews
     dummy_reviews = [
@@ -93,12 +295,143 @@ def create_db():
         ('Gadget Store', 4, 'ของเยอะดี', 'User02'),
         ('เสื้อผ้าแฟชั่น', 5, 'แม่ค้าใจดี', 'User03')
     ]
-    for r in dummy_reviews:
-        c.execute("INSERT INTO reviews (shop_name, rating, comment, reviewer_name) VALUES (?, ?, ?, ?)", r)
+    c.executemany("INSERT INTO reviews (shop_name, rating, comment, reviewer_name) VALUES (?, ?, ?, ?)", dummy_reviews)
+
+    rebuild_review_stats(c)
+    rebuild_counters(c)
+    migrate_legacy_credit(c)
+
+    # ผังล็อคเปลี่ยนทั้งหมด ให้ worker ที่รันอยู่โหลด cache ใหม่
+    bump_board_version(c)
 
     conn.commit()
     conn.close()
     print(">>> Setup Database Complete!")
 
+# --- ข้อมูลจำลองขนาดใหญ่ (ไว้ทดสอบ hot path ตอนข้อมูลเยอะ) ---
+# สุ่มจาก seed เดิมได้ผลเดิมทุกครั้ง ใส่ทีละก้อนด้วย executemany ใน transaction เดียว
+# ปิด journal/fsync ระหว่างโหลด (ไฟล์ใหม่ทั้งไฟล์ ถ้าพังกลางทางก็แค่สร้างใหม่)
+FAST_LOAD_PRAGMAS = {
+    'journal_mode': 'OFF',
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': -200000,
+    'locking_mode': 'EXCLUSIVE',
+}
+
+REVIEW_COMMENTS = ['อร่อยมากครับ', 'ของเยอะดี', 'แม่ค้าใจดี', 'ราคาไม่แพง', 'รอนานไปหน่อย', 'จะมาอีกแน่นอน', 'ก็โอเค']
+
+
+def zone_prefix(i):
+    # A..Z แล้วต่อด้วย AA, AB, ...
+    return chr(65 + i) if i < 26 else chr(64 + i // 26) + chr(65 + i % 26)
+
+
+def generate_zones(count):
+    # 3 โซนแรกคือโซนจริงของตลาด ที่เกินมาตั้งชื่อ Zone D, Zone E, ...
+    return ZONES[:count] + [(f'Zone {zone_prefix(i)}', zone_prefix(i), 300) for i in range(len(ZONES), count)]
+
+
+def generate_db(path, zones=3, stalls_per_zone=12, users=100, reviews=1000, days=7, occupancy=0.6,
+                seed=None, password='1234', hash_method='pbkdf2:sha256:600000', credit=5000):
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    for name, value in FAST_LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    create_tables(conn.cursor())
+    conn.execute("BEGIN")
+
+    # ทุกคนใช้ hash เดียวกัน (hash ช้าโดยตั้งใจ ทำครั้งเดียวพอ)
+    password_hash = generate_password_hash(password, hash_method)
+    conn.execute("INSERT INTO users (username, password, role) VALUES ('admin', ?, 'admin')", (password_hash,))
+    conn.executemany("INSERT INTO users (username, password, role) VALUES (?, ?, 'user')",
+                     ((f'vendor{i:05d}', password_hash) for i in range(users)))
+    conn.execute("""
+        INSERT INTO credit_journal (user_id, delta, reason, idempotency_key)
+        SELECT id, ?, 'topup', 'seed:' || id FROM users WHERE role = 'user'
+    """, (credit,))
+    user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE role = 'user'")] or [1]
+
+    zone_list = generate_zones(zones)
+    shops = [f'{FAKE_SHOPS[k % len(FAKE_SHOPS)]} {k // len(FAKE_SHOPS) + 1}'
+             for k in range(max(len(zone_list) * stalls_per_zone, len(FAKE_SHOPS)))]
+    today = datetime.strptime(thai_today(), '%Y-%m-%d')
+    today_str = today.strftime('%Y-%m-%d')
+
+    stalls = []
+    for zone_name, prefix, price in zone_list:
+        category = CAT_MAP.get(zone_name, 'ของใช้')
+        for i in range(1, stalls_per_zone + 1):
+            if rng.random() < occupancy:
+                stalls.append((f'{prefix}{i:02d}', zone_name, price, 'booked', rng.choice(shops), '081-234-5678',
+                               category, today_str, rng.choice(user_ids), f'SLIP-{rng.randint(1000, 9999)}', 'paid'))
+            else:
+                stalls.append((f'{prefix}{i:02d}', zone_name, price, 'available', '', '', '', '', None, '', 'pending'))
+    conn.executemany(STALL_INSERT, stalls)
+
+    # ประวัติย้อนหลัง: จอง / ยกเลิก / ค้างถึงตอน reset ของแต่ละวัน แล้วสรุปลง daily_rollups
+    stall_rows = conn.execute("SELECT id, zone, price, status, booked_by FROM stalls").fetchall()
+    ledger_rows = []
+    for d in range(days, 0, -1):
+        day = (today - timedelta(days=d)).strftime('%Y-%m-%d')
+        for stall_id, zone_name, price, _, _ in stall_rows:
+            if rng.random() < occupancy:
+                user_id = rng.choice(user_ids)
+                ledger_rows.append(('book', stall_id, zone_name, user_id, price, day))
+                event = 'cancel' if rng.random() < 0.1 else 'reset'
+                ledger_rows.append((event, stall_id, zone_name, user_id, price, day))
+    ledger_rows.extend(('book', stall_id, zone_name, booked_by, price, today_str)
+                       for stall_id, zone_name, price, status, booked_by in stall_rows if status == 'booked')
+    conn.executemany("""
+        INSERT INTO booking_ledger (event, stall_id, zone, user_id, amount, event_date) VALUES (?, ?, ?, ?, ?, ?)
+    """, ledger_rows)
+    rollup_closed_days(conn, today_str)
+
+    weights = [1, 1, 2, 4, 5]
+    conn.executemany("INSERT INTO reviews (shop_name, rating, comment, reviewer_name) VALUES (?, ?, ?, ?)",
+                     ((rng.choice(shops), rng.choices(range(1, 6), weights)[0], rng.choice(REVIEW_COMMENTS),
+                       f'vendor{rng.randrange(max(users, 1)):05d}') for _ in range(reviews)))
+
+    rebuild_review_stats(conn)
+    rebuild_counters(conn)
+    bump_board_version(conn)
+    conn.execute("INSERT OR REPLACE INTO app_state (key, value) VALUES ('last_reset_day', ?)", (today_str,))
+    conn.execute("COMMIT")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    return {'zones': len(zone_list), 'stalls': len(stalls), 'users': users + 1, 'reviews': reviews,
+            'ledger': len(ledger_rows)}
+
+
 if __name__ == '__main__':
-    create_db()
\ No newline at end of file
+    # python setup_db.py                      -> market.db ตัวอย่างเล็กๆ เหมือนเดิม
+    # python setup_db.py --generate --db big.db --zones 10 --stalls-per-zone 1000 --reviews 100000
+    parser = argparse.ArgumentParser(description='สร้างฐานข้อมูลตลาด')
+    parser.add_argument('--db', default='market.db')
+    parser.add_argument('--generate', action='store_true', help='สร้างข้อมูลจำลองตามขนาดที่กำหนด (ไฟล์ใหม่)')
+    parser.add_argument('--force', action='store_true', help='ลบไฟล์เดิมก่อนสร้าง')
+    parser.add_argument('--zones', type=int, default=3)
+    parser.add_argument('--stalls-per-zone', type=int, default=12)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--reviews', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=7, help='วันย้อนหลังใน booking_ledger')
+    parser.add_argument('--occupancy', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:600000')
+    args = parser.parse_args()
+
+    if not args.generate:
+        create_db(args.db)
+    else:
+        if args.force:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+        started = datetime.now()
+        counts = generate_db(args.db, zones=args.zones, stalls_per_zone=args.stalls_per_zone, users=args.users,
+                             reviews=args.reviews, days=args.days, occupancy=args.occupancy, seed=args.seed,
+                             hash_method=args.hash_method)
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f">>> Generated {args.db} in {elapsed:.1f}s: " + ', '.join(f'{k}={v}' for k, v in counts.items()))
\ No newline at end of file
@@ -0,0 +1,47 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+from credits import USER_SELECT
+
+# --- Cache ข้อมูลผู้ใช้ที่ login อยู่ (ต่อ worker, LRU จำกัดขนาด) ---
+# ทุกหน้าเช็คแค่ user_versions (PK เดียว) ถ้า version ตรงกับที่ cache ไว้ก็ไม่ต้องแตะ users / credit_balances
+# trigger ใน setup_db บวก version ทุกครั้งที่เครดิตหรือแถว users เปลี่ยน เครดิตที่แสดงจึงไม่ค้าง
+
+
+class UserCache:
+
+    def __init__(self, size=1024):
+        self.size = size
+        self._users = OrderedDict()     # user_id -> (version, record)
+        self._lock = threading.Lock()
+
+    def get(self, conn, user_id):
+        row = conn.execute("SELECT version FROM user_versions WHERE user_id=?", (user_id,)).fetchone()
+        version = row[0] if row else 0
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached and cached[0] == version:
+                self._users.move_to_end(user_id)
+                return cached[1]
+        # อ่านหลังได้ version แล้ว ถ้ามีคนเขียนแทรกระหว่างนี้ version รอบหน้าจะไม่ตรงแล้วโหลดใหม่เอง
+        user = conn.execute(USER_SELECT + " WHERE users.id=?", (user_id,)).fetchone()
+        if user is None:
+            return None
+        record = {k: user[k] for k in user.keys() if k != 'password'}
+        with self._lock:
+            self._users[user_id] = (version, record)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.size:
+                self._users.popitem(last=False)
+        return record
+
+
+def init_app(app):
+    app.config.setdefault('USER_CACHE_SIZE', 1024)
+    app.extensions['user_cache'] = UserCache(app.config['USER_CACHE_SIZE'])
+
+
+def get_user(conn, user_id):
+    return current_app.extensions['user_cache'].get(conn, user_id)